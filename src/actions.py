@@ -14,7 +14,7 @@ class ActionType(Enum):
     SPECIAL = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class Action:
     id: str
     name: str
@@ -27,8 +27,11 @@ class Action:
     effects: Optional[dict] = None # each effect should be listed separately
     proficiency_type: Optional[ProficiencyType] = None
     resource_cost: Optional[dict] = None
+    profile: Optional[object] = None # parsed stat block entry (npcs.ActionProfile) the action came from
 
 class ActionManager:
+    __slots__ = ("owner", "_actions")
+
     def __init__(self, owner):
         self.owner = owner
         self._actions = {}
@@ -65,19 +68,19 @@ class ActionManager:
     def roll_ability_check(self, ability,advantage=None):
         return DiceHandler().roll(dice_specs = [(20,1)],
                                   modifiers=self.owner.ability_scores.modifier(ability), 
-                                  features=self.owner.features._features,
+                                  features=self.owner.features.roll_features,
                                   advantage=advantage)
     
     def roll_skill_check(self, skill,advantage=None):
         return DiceHandler().roll(dice_specs = [(20,1)],
                                   modifiers=self.owner.skill_scores[skill], 
-                                  features=self.owner.features._features,
+                                  features=self.owner.features.roll_features,
                                   advantage=advantage)
     
     def roll_saving_throw(self, ability,advantage=None):
         return DiceHandler().roll(dice_specs = [(20,1)],
                                   modifiers=self.owner.saving_throws[ability], 
-                                  features=self.owner.features._features,
+                                  features=self.owner.features.roll_features,
                                   advantage=advantage)
 
 
@@ -0,0 +1,133 @@
+# Performance guards for the engine. Run from src/:
+#   python benchmarks.py import       import time of `character` against its budget
+#   python benchmarks.py normalize    single pass FG loading against decode-then-walk
+#   python benchmarks.py npc_memory   bytes per NPC over 100k create_npc results
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds a fresh `import character` may take (median of several runs).
+IMPORT_BUDGET = 0.4
+
+
+def import_time(module="character", runs=5):
+    """Median wall time of importing `module` in a fresh interpreter."""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "print(time.perf_counter() - start)\n"
+        "print(int('pandas' in sys.modules))\n"
+    )
+    timings, pandas_loaded = [], False
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR,
+                             capture_output=True, text=True, check=True).stdout.split()
+        timings.append(float(out[0]))
+        pandas_loaded = pandas_loaded or out[1] == "1"
+    return statistics.median(timings), pandas_loaded
+
+
+def check_import_budget(module="character", budget=IMPORT_BUDGET, runs=5):
+    """Raise if importing `module` is over budget or drags in pandas."""
+    seconds, pandas_loaded = import_time(module, runs)
+    print(f"import {module}: {seconds * 1000:.1f} ms (budget {budget * 1000:.0f} ms), pandas loaded: {pandas_loaded}")
+    if pandas_loaded:
+        raise RuntimeError(f"import {module} loads pandas, keep it to analytics code paths")
+    if seconds > budget:
+        raise RuntimeError(f"import {module} took {seconds:.3f}s, over the {budget:.3f}s budget")
+    return seconds
+
+
+def _recursive_normalize(obj, collapse_all=False):
+    """The decode-then-walk normalizer the loaders used before FGNormalizer."""
+    if isinstance(obj, dict):
+        if "#text" in obj and (collapse_all or len(obj) <= 2):
+            text = obj["#text"]
+            return int(text) if obj.get("@type") == "number" else text
+        return {k: _recursive_normalize(v, collapse_all) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_recursive_normalize(x, collapse_all) for x in obj]
+    return obj
+
+
+def _best_of(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def check_normalize(runs=5):
+    """Raise if single pass loading of data/*.json is not faster than decoding and walking the tree."""
+    from helper_functions import FG_SHAPES, load_fg
+    from repositories import DATA_DIR
+
+    old_total = new_total = 0.0
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "*.json"))):
+        shape = os.path.basename(path)[:-len(".json")]
+        if shape not in FG_SHAPES:
+            continue
+        collapse_all = FG_SHAPES[shape].collapse_all
+
+        def legacy():
+            with open(path, "r", encoding="utf-8") as f:
+                return _recursive_normalize(json.load(f), collapse_all)
+
+        old, new = _best_of(legacy, runs), _best_of(lambda: load_fg(path, shape), runs)
+        old_total, new_total = old_total + old, new_total + new
+        print(f"{os.path.basename(path)}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms ({old / new:.1f}x)")
+    print(f"total: {old_total * 1000:.1f} ms -> {new_total * 1000:.1f} ms")
+    if new_total >= old_total:
+        raise RuntimeError("single pass FG loading is not faster than decode-then-walk")
+    return new_total
+
+
+def npc_memory(count=100_000, names=None):
+    """Bytes held per NPC by `count` live create_npc results, cycling through the bestiary."""
+    import repositories
+    from npcs import create_npc
+
+    npcs = repositories.npcs()
+    records = [npcs.record(name) for name in (names or npcs.names())]
+    create_npc(records[0])      # warm the caches shared by every NPC (repositories, compiled actions)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    before = tracemalloc.get_traced_memory()[0]
+    population = [create_npc(records[i % len(records)]) for i in range(count)]
+    held = tracemalloc.get_traced_memory()[0] - before
+    seconds = time.perf_counter() - start
+    tracemalloc.stop()
+
+    per_npc = held / len(population)
+    print(f"{len(population)} NPCs: {held / 2**20:.1f} MiB, {per_npc:,.0f} bytes per NPC ({seconds:.1f}s traced)")
+    return per_npc
+
+
+BENCHMARKS = {
+    "import": check_import_budget,
+    "normalize": check_normalize,
+    "npc_memory": npc_memory,
+}
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    failed = False
+    for name in names:
+        try:
+            BENCHMARKS[name]()
+        except RuntimeError as e:
+            print(f"FAILED {name}: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -1,21 +1,32 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext, redirect_stdout
 from dataclasses import dataclass, field
-from typing import Dict, List
+from enum import Enum
+from itertools import islice
+from typing import Dict, List, Optional
+import copy
+import functools
+import io
 import math
-import random as random
-
-import pandas as pd
+import os
+import threading
+import rng
 
 from features import FeatureManager
 from conditions import ConditionManager
 from effects import EffectsManager
 from spellcasting import Spellcasting
 from classes import CharClass
-from proficiency import ProficiencyManager, ProficiencyType
-from races import Race
+from proficiency import ProficiencyManager
+from races import CSVRepository, Race
 from items import Item
 from resources import ResourcePool
 from actions import ActionManager
+from name_index import best_match
 from classes import ClassProgression
+import repositories
+import derived_stats
+from derived_stats import CachedArmorClass, DerivedStats, DerivedView, SKILLS
 
 ABILITY_NAMES = ["STR", "DEX", "CON", "INT", "WIS", "CHA"]
 
@@ -40,7 +51,30 @@ class PCFactory:
                      ability_score_values=None # list of valid point buy numbers [8,10,11,13,15,8]
                      ):
         pc = PC(name, race, background)
+        pc.ability_scores = AbilityScores(pc, PCFactory.ability_scores(ability_method, ability_score_assignment, ability_score_values))
+        
+        # Apply race bonuses
+        if pc.identity.race:
+           Race(pc.identity.race).apply(pc)
+        
+        # Apply background bonuses
+        if pc.identity.background:
+            Background(pc.identity.background).apply(pc)
+
+        # Apply class, etc.
+        if char_class:
+            pc.classes.add_class(char_class, pc)
         
+        # If "Spellcasting" is the name of a feature, we need to add some spells to the character... ideally the person gets to pick them
+
+        # Ensure the character is a valid 5e character
+        PCValidator(pc).validate()
+
+        return pc
+
+    @staticmethod
+    def ability_scores(ability_method="standard", ability_score_assignment=None, ability_score_values=None):
+        """The {ability: score} a build starts from, before race bonuses."""
         # Generate the values
         if ability_method == "standard":
             ability_score_values = AbilityScoreGenerator.standard_array()
@@ -64,33 +98,196 @@ class PCFactory:
             if set(ability_score_assignment) != expected:
                 raise ValueError(f"Keys must be exactly {expected}, got {ability_score_assignment}")
 
-        pc.ability_scores = AbilityScores(pc, dict(zip(ability_score_assignment, sorted(ability_score_values, reverse=True))))
-        
-        # Apply race bonuses
-        if pc.identity.race:
-           Race(pc.identity.race).apply(pc)
-        
-        # Apply background bonuses
-        if pc.identity.background:
-            Background(pc.identity.background).apply(pc)
+        return dict(zip(ability_score_assignment, sorted(ability_score_values, reverse=True)))
 
-        # Apply class, etc.
-        if char_class:
+    @staticmethod
+    def create_from_template(name, race, background, char_class, level=1,
+                             ability_method="standard", ability_score_assignment=None, ability_score_values=None):
+        """Same character as create_basic (plus level - 1 level ups), cloned from the cached prototype of the build."""
+        scores = PCFactory.ability_scores(ability_method, ability_score_assignment, ability_score_values)
+        return pc_templates.clone(race, char_class, background, level, name, scores)
+
+    @staticmethod
+    def create_many(specs, workers=None, seed=None, batch_size=64, quiet=True):
+        """
+        Build a PC for every spec (a dict of create_basic arguments), returning a BuildResult per spec in order.
+        Specs can be any iterable, they are consumed batch by batch. Batches run on a process pool
+        (workers=1 builds in-process) and each draws from its own child stream of seed, so results
+        do not depend on the number of workers. quiet hides the build's progress prints.
+        """
+        return list(PCFactory.iter_many(specs, workers, seed, batch_size, quiet))
+
+    @staticmethod
+    def iter_many(specs, workers=None, seed=None, batch_size=64, quiet=True):
+        """Generator version of create_many."""
+        workers = workers or os.cpu_count() or 1
+        root = rng.RNGStream(seed)
+        specs = iter(specs)
+        batches = iter(lambda: list(islice(specs, batch_size)), [])
+
+        if workers == 1:
+            for batch in batches:
+                yield from _build_batch(batch, root.spawn()[0].seed_sequence, quiet)
+            return
+
+        # load the rules once here, forked workers inherit them and _load_rules covers spawned ones
+        _load_rules()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_load_rules) as pool:
+            pending = []
+            for batch in batches:
+                pending.append(pool.submit(_build_batch, batch, root.spawn()[0].seed_sequence, quiet))
+                # keep a bounded number of batches in flight so a stream of specs is never read ahead
+                if len(pending) >= 2 * workers:
+                    yield from pending.pop(0).result()
+            for future in pending:
+                yield from future.result()
+
+
+_IMMUTABLE = {str, int, float, bool, tuple, frozenset}
+
+
+@functools.cache
+def _slot_names(cls):
+    return tuple(name for klass in cls.__mro__ for name in klass.__dict__.get("__slots__", ()))
+
+
+class PCTemplateCache:
+    """
+    Fully built prototype PCs keyed by (race, class, background, level), new characters are cloned from them.
+    Clones share the feature, action, spell and item objects of the prototype and deep-copy the rest
+    (hp, resources, inventory counts, proficiencies, conditions). Prototypes are built from all-10
+    ability scores, a clone gets its own scores plus the race bonuses and its hp adjusted for CON.
+    """
+
+    BASE_SCORE = 10
+
+    def __init__(self):
+        self._templates = {}    # key -> (prototype, {id: shared object})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._templates)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    @staticmethod
+    def _build(race, char_class, background, level):
+        pc = PCFactory.create_basic("", race, background, char_class, ability_method="point_buy",
+                                    ability_score_values=[PCTemplateCache.BASE_SCORE] * 6)
+        for _ in range(level - 1):
             pc.classes.add_class(char_class, pc)
-        
-        # If "Spellcasting" is the name of a feature, we need to add some spells to the character... ideally the person gets to pick them
-        
-        pc.update_saving_throws()
-        pc.update_skills()
+        return pc
 
-        # Ensure the character is a valid 5e character
-        PCValidator(pc).validate()
+    @staticmethod
+    def _shared(pc):
+        shared = [*pc.features._features, *pc.actions._actions.values(), *pc.inventory.items,
+                  *pc.spells.known_spells.values(), *pc.spells.prepared_spells.values()]
+        return {id(obj): obj for obj in shared}
+
+    def prototype(self, race, char_class, background, level=1):
+        key = (race, char_class, background, level)
+        template = self._templates.get(key)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is None:
+                    if not 1 <= level <= 20:
+                        raise ValueError("level must be an integer greater than 0 and no more than 20")
+                    prototype = self._build(race, char_class, background, level)
+                    template = self._templates[key] = (prototype, self._shared(prototype))
+                    self.misses += 1
+                    return template
+        self.hits += 1
+        return template
 
+    @staticmethod
+    def _clone(prototype, shared):
+        """Structured copy of a prototype: shared and immutable values are reused, back references remapped."""
+        pc = object.__new__(type(prototype))
+
+        def clone(value):
+            kind = type(value)
+            if kind in _IMMUTABLE or value is None or id(value) in shared or isinstance(value, Enum):
+                return value
+            if value is prototype:
+                return pc
+            if kind is dict:
+                return {k: clone(v) for k, v in value.items()}
+            if kind is list:
+                return [clone(v) for v in value]
+            if kind is set:
+                return set(value)
+            slots = _slot_names(kind)
+            if not slots and not hasattr(value, "__dict__"):
+                return copy.copy(value)
+            part = object.__new__(kind)
+            if hasattr(value, "__dict__"):
+                part.__dict__.update((attr, clone(v)) for attr, v in value.__dict__.items())
+            for attr in slots:
+                if hasattr(value, attr):
+                    object.__setattr__(part, attr, clone(getattr(value, attr)))
+            return part
+
+        pc.__dict__.update((attr, clone(v)) for attr, v in prototype.__dict__.items())
         return pc
 
+    def clone(self, race, char_class, background, level, name, scores):
+        prototype, shared = self.prototype(race, char_class, background, level)
+        pc = self._clone(prototype, shared)
+        pc.identity.name = name
+
+        # swap the base scores under the race bonuses, CON changes hp once per level
+        bonuses = prototype.ability_scores.scores
+        pc.ability_scores.scores = {a: scores[a] + bonuses[a] - self.BASE_SCORE for a in ABILITY_NAMES}
+        hp_change = (pc.ability_scores.modifier("CON") - prototype.ability_scores.modifier("CON")) * level
+        pc.resources.max_hit_points += hp_change
+        pc.resources.current_hit_points += hp_change
+
+        PCValidator(pc).validate()
+        return pc
+
+
+pc_templates = PCTemplateCache()
+
+
+@dataclass
+class BuildResult:
+    spec: dict
+    pc: Optional["PC"] = None
+    error: Optional[str] = None     # the ValueError raised by the build or PCValidator, or the malformed spec's error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _load_rules():
+    for name in ("races", "backgrounds", "classes", "spells"):
+        repositories.get(name)
+
+
+def _build_batch(specs, seed_sequence, quiet=True):
+    results = []
+    output = redirect_stdout(io.StringIO()) if quiet else nullcontext()
+    with rng.use_stream(rng.RNGStream(seed_sequence)), output:
+        for spec in specs:
+            try:
+                results.append(BuildResult(spec, pc=PCFactory.create_basic(**spec)))
+            except ValueError as e:
+                results.append(BuildResult(spec, error=str(e)))
+            except (TypeError, KeyError) as e:
+                # a malformed spec (unknown option, missing key) fails only its own build
+                results.append(BuildResult(spec, error=f"{type(e).__name__}: {e}"))
+    return results
+
 # Main PC class
 class PC:
     def __init__(self, name, race, background):
+        self.derived = DerivedStats(self)
         self.identity = Identity(name, race, background)
         self.ability_scores = AbilityScores(self)
         self.classes = ClassProgression(self)
@@ -105,55 +302,40 @@ class PC:
         self.stats = ComputedStats(self)
         self.actions = ActionManager(self)
 
+    def __repr__(self):
+        return f"PC({self.identity.name!r} is a level {len(self.classes.classes)} {self.identity.race!r} {self.classes.classes[0]} who is currently sitting at {self.resources.current_hit_points} hit points, with the following attributes: {self.ability_scores.scores})"
 
-        # Generate skill scores
-        self.skill_scores = dict()
-        self.update_skills()
+    # Derived values are computed on read and dropped when one of their inputs changes (see derived_stats)
+    @property
+    def skill_scores(self):
+        return DerivedView(self.derived, "skill", SKILLS)
 
-        self.saving_throws = dict()
-        self.update_saving_throws()
+    @property
+    def saving_throws(self):
+        return DerivedView(self.derived, "save", ABILITY_NAMES)
+
+    @property
+    def passive_perception(self):
+        return self.derived.get("passive_perception")
+
+    @property
+    def initiative(self):
+        return self.derived.get("initiative")
+
+    @property
+    def spell_save_dc(self):
+        return self.derived.get("spell_save_dc")
+
+    @property
+    def armor_class(self):
+        return self.stats.armor_class()
 
-    def __repr__(self):
-        return f"PC({self.identity.name!r} is a level {len(self.classes.classes)} {self.identity.race!r} {self.classes.classes[0]} who is currently sitting at {self.resources.current_hit_points} hit points, with the following attributes: {self.ability_scores.scores})"
-    
     def update_skills(self):
-        skills = {
-            "athletics": "STR",
-            "acrobatics": "DEX",
-            "sleight_of_hand": "DEX",
-            "stealth": "DEX",
-            "arcana": "INT",
-            "history": "INT",
-            "investigation": "INT",
-            "nature": "INT",
-            "religion": "INT",
-            "animal_handling": "WIS",
-            "insight": "WIS",
-            "medicine": "WIS",
-            "perception": "WIS",
-            "survival": "WIS",
-            "deception": "CHA",
-            "intimidation": "CHA",
-            "performance": "CHA",
-            "persuasion": "CHA",
-        }
-        
-        # Apply the ability score + proficiency bonus
-        for skill in skills:
-            if skill in self.proficiencies.proficiencies[ProficiencyType.SKILL]:
-                self.skill_scores[skill] = self.ability_scores.modifier(skills[skill]) + self.proficiencies.proficiency_bonus
-            else:
-                self.skill_scores[skill] = self.ability_scores.modifier(skills[skill])
+        # kept for callers that force a refresh, skills are recomputed on read anyway
+        self.derived.reset("skill")
     
     def update_saving_throws(self):
-        saving_throws = ["STR","DEX","CON","INT","WIS","CHA"]
-        
-        # Apply the ability score + proficiency bonus
-        for abiility in saving_throws:
-            if abiility in self.proficiencies.proficiencies[ProficiencyType.SAVE]:
-                self.saving_throws[abiility] = self.ability_scores.modifier(abiility) + self.proficiencies.proficiency_bonus
-            else:
-                self.saving_throws[abiility] = self.ability_scores.modifier(abiility)
+        self.derived.reset("save")
 
 
 
@@ -161,6 +343,8 @@ class PC:
 
 # Who you are
 class Identity:
+    __slots__ = ("name", "race", "background")
+
     def __init__(self, name, race, background):
         self.name = name
         self.race = race
@@ -204,14 +388,18 @@ class AbilityScoreGenerator:
     @staticmethod
     def roll_4d6_drop_lowest():
         result = []
+        randint = rng.current().randint
         for _ in range(6):
-            rolls = sorted([random.randint(1, 6) for _ in range(4)])
+            rolls = sorted([randint(1, 6) for _ in range(4)])
             result.append(sum(rolls[1:]))
          # Returns a list of six scores
         return result
 
 
 class AbilityScores:
+    __slots__ = ("owner", "_scores")
+    ability_names = ("STR", "DEX", "CON", "INT", "WIS", "CHA")
+
     def __init__(self,
                  owner,
                  scores= {
@@ -224,7 +412,16 @@ class AbilityScores:
                  }):
         self.owner = owner
         self.scores = scores
-        self.ability_names = ["STR","DEX","CON","INT","WIS","CHA"]
+
+    @property
+    def scores(self):
+        return self._scores
+
+    # replacing the scores invalidates everything derived from them, edit them through apply_bonuses
+    @scores.setter
+    def scores(self, scores):
+        self._scores = dict(scores)
+        derived_stats.invalidate(self.owner, *derived_stats.ALL_ABILITIES)
 
     # Retrieves the bonus for the names base ability
     def modifier(self, stat):
@@ -235,10 +432,13 @@ class AbilityScores:
         for key in bonus_dict:
             if key in self.ability_names:
                 self.scores[key] = self.scores[key] + bonus_dict[key]
+                derived_stats.invalidate(self.owner, derived_stats.ability_input(key))
                 print(key,"updated by", bonus_dict[key])
 
 
 class Inventory:
+    __slots__ = ("owner", "items", "equipped")
+
     def __init__(self, owner):
         self.owner = owner
         self.items = {}  # {Item: quantity}
@@ -249,9 +449,11 @@ class Inventory:
         if item in self.items:
             if equip_or_unequip=="equip":
                 self.equipped.add(item)
+                derived_stats.invalidate(self.owner, derived_stats.EQUIPMENT)
                 # need a function that runs here to ensure equipped item effects are applied properly
             elif equip_or_unequip=="unequip":
                 self.equipped.remove(item)
+                derived_stats.invalidate(self.owner, derived_stats.EQUIPMENT)
                 # need a function that runs here to ensure equipped item effects are applied properly
             else:
                 raise ValueError(f"equip_or_unequip must be one of equip or unequip, not {equip_or_unequip}")
@@ -261,9 +463,22 @@ class Inventory:
 
     def get(self, item_name):
         return next((obj for obj in self.items if obj.name == item_name), None)
+
+    def modify_armor_class(self, ctx):
+        # equipped items that affect AC (armor, shields, rings) implement modify_armor_class(ctx)
+        for item in self.equipped:
+            modify = getattr(item, "modify_armor_class", None)
+            if modify is not None:
+                modify(ctx)
+
+    def resolve(self, item_name, min_score=0.5):
+        """(item, score) for the closest item name in the inventory, or (None, 0.0)."""
+        match = best_match(item_name, [obj.name for obj in self.items], min_score=min_score)
+        return (self.get(match.name), match.score) if match else (None, 0.0)
         
     def add_item(self, item, quantity=1):
         self.items[item] = self.items.get(item, 0) + quantity
+        derived_stats.invalidate(self.owner, derived_stats.EQUIPMENT)
 
     def remove_item(self, item, quantity=1):
         if item not in self.items:
@@ -272,16 +487,22 @@ class Inventory:
         self.items[item] -= quantity
         if self.items[item] <= 0:
             del self.items[item]
+            self.equipped.discard(item)
+        derived_stats.invalidate(self.owner, derived_stats.EQUIPMENT)
 
 
 
+class BackgroundRepository(CSVRepository):
+    def __init__(self, path="../data/woc_backgrounds.csv"):
+        super().__init__(path)
+
+
 class Background:
     def __init__(self, id):
-        df = pd.read_csv("../data/woc_backgrounds.csv")
         self.id = id
-        if id not in df["name"].values:
+        self.racial_data = repositories.backgrounds().get(id)
+        if self.racial_data is None:
             raise ValueError(f"{id} not a valid background.")
-        self.racial_data=df[df["name"]==id].iloc[0].to_dict()
 
 
     def apply(self, character):
@@ -306,29 +527,28 @@ class ArmorClassContext:
     def add_bonus(self, value):
         self.bonus += value
 
-class ComputedStats:
+class ComputedStats(CachedArmorClass):
+    __slots__ = ("pc",)
+
     def __init__(self, pc):
+        super().__init__()
         self.pc = pc
-    #     self._ac_cache = self.armor_class()
 
-    def armor_class(self):
-        return 10
+    def _compute_armor_class(self):
         ctx = ArmorClassContext(self.pc)
 
-        # # Armor & shields
-        # self.pc.inventory.modify_armor_class(ctx)
-
-        # # Class & racial features
-        # self.pc.features.modify_armor_class(ctx)
+        # Armor & shields
+        self.pc.inventory.modify_armor_class(ctx)
 
-        # # Conditions (haste, restrained, etc.)
-        # self.pc.conditions.modify_armor_class(ctx)
+        # Conditions (haste, restrained, etc.)
+        self.pc.conditions.apply_armor_class_effects(ctx)
 
-        # dex_mod = self.pc.ability_scores.modifier("dex")
+        dex_mod = self.pc.ability_scores.modifier("DEX")
         if ctx.dex_cap is not None:
             dex_mod = min(dex_mod, ctx.dex_cap)
 
-        return ctx.base + dex_mod + ctx.bonus
+        # Class & racial features
+        return self.pc.features.modify_ac(self.pc, ctx.base + dex_mod + ctx.bonus)
     
     # def total_level(self):
     #     # Simple sum of all classes in ClassProgression
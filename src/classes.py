@@ -1,10 +1,11 @@
-import json
 from collections import defaultdict
-from helper_functions import normalize_fg, clean_item_description, extract_link_text
+from helper_functions import load_fg, clean_item_description, extract_link_text
 from proficiency import ProficiencyType
 from resources import ResourceCategory, Resource, RechargeType
 
 import re
+import repositories
+import derived_stats
 
 def parse_class_table(table_data):
     progression = {}
@@ -214,13 +215,18 @@ class CharClass:
 
     def level_up(self, character,level):
 
-        # Add hp
-        character.resources.update_health(self.levelup_hp )
+        # Add hp, the fixed value ("1d6 (or 4) + your Constitution modifier ...") plus CON
+        fixed_hp = re.search(r"\(or (\d+)\)", self.levelup_hp)
+        character.resources.update_health(int(fixed_hp.group(1)) + character.ability_scores.modifier("CON"))
+
+        # Add a hit die
+        num, sides = self.hit_dice.split()[0].split('d')
+        character.resources.update_hit_die(int(sides), int(num))
         
         # Add features
-        new_level_features =  self.class_features[level]
+        new_level_features =  self.class_features.get(level, {})
         for feat in new_level_features:
-            character.features.add_feature(new_level_features[feat], character)
+            character.features.add_feature(feat, character, description=new_level_features[feat])
 
         # Update resources
         # Add resources
@@ -229,13 +235,12 @@ class CharClass:
                 "cantrips",self.levelup_spell_slots[level]["cantrips"],set_max=True)
             for lvl in self.levelup_spell_slots[level]["slots"]:
                 character.resources.update_spell_slots(
-                "Level_{lvl}",self.levelup_spell_slots[level]["slots"][f"{lvl}"],set_max=True)
+                f"Level_{lvl}",self.levelup_spell_slots[level]["slots"][lvl],set_max=True)
 
         
 class CharClassRepository:
     def __init__(self, path="../data/class.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            raw_data = normalize_fg(json.load(f))
+        raw_data = load_fg(path, "class")
 
         # Create objects
         self.all_charclasses = [CharClass(item) for item in raw_data]
@@ -270,15 +275,21 @@ class CharClassRepository:
 
 
 class ClassProgression:
+    __slots__ = ("owner", "classes")
+
     def __init__(self, owner):
         self.owner = owner
         self.classes = []  # e.g. [Fighter, Fighter, Fighter, Rogue]
 
     def add_class(self, char_class, pc):
         # Create the class fist to make sure char_class is valid
-        new_class = CharClassRepository().get(char_class)
+        new_class = repositories.classes().get(char_class)
+        if new_class is None:
+            raise ValueError(f"{char_class} not a valid class.")
         # add the new class
         self.classes.append(new_class.name)
+        pc.proficiencies.update_proficiency_bonus(self.pc_level())
+        derived_stats.invalidate(pc, derived_stats.CLASSES)
 
         # get the level of the new class being added
         class_level_to_add = sum([1 for val in self.classes if val==new_class.name])
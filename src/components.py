@@ -0,0 +1,25 @@
+# Creature sub-managers built on first use. Most NPCs of a large population never touch their
+# spells, inventory, conditions or features, so those are only created when something reads them.
+class lazy_component:
+    """
+    Class attribute building factory(owner) on first access and storing it on the owner, later reads
+    (and assignments) go straight to the instance. The owner needs a __dict__.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.name = None
+
+    def __set_name__(self, owner_class, name):
+        self.name = name
+
+    def __get__(self, owner, owner_class=None):
+        if owner is None:
+            return self
+        component = owner.__dict__[self.name] = self.factory(owner)
+        return component
+
+
+def peek(owner, name):
+    """The component if it has been created, else None. Read only paths use it to avoid building one."""
+    return owner.__dict__.get(name)
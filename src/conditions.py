@@ -1,15 +1,22 @@
+import derived_stats
+
+
 class ConditionManager:
+    __slots__ = ("owner", "conditions")
+
     def __init__(self, owner):
         self.owner = owner
         self.conditions = []
 
     def add(self, condition):
         self.conditions.append(condition)
+        derived_stats.invalidate(self.owner, derived_stats.CONDITIONS)
 
     def remove(self, condition_type):
         self.conditions = [
             c for c in self.conditions if not isinstance(c, condition_type)
         ]
+        derived_stats.invalidate(self.owner, derived_stats.CONDITIONS)
 
     def apply_attack_effects(self, context):
         for condition in self.conditions:
@@ -23,6 +30,10 @@ class ConditionManager:
         for condition in self.conditions:
             condition.affects_saving_throw(context)
 
+    def apply_armor_class_effects(self, context):
+        for condition in self.conditions:
+            condition.affects_armor_class(context)
+
 class Condition:
     def affects_attack(self, context):
         pass
@@ -33,6 +44,9 @@ class Condition:
     def affects_saving_throw(self, context):
         pass
 
+    def affects_armor_class(self, context):
+        pass
+
 # Individual condition classes
 
 class Blinded(Condition):
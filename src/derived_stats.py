@@ -0,0 +1,207 @@
+# Derived character values (skills, saves, passive perception, initiative, spell save DC)
+# computed on first read and cached. Every value declares the inputs it reads; the managers
+# that own those inputs call invalidate(owner, ...) when they change, which drops only the
+# values depending on them. Armor class is cached on the creature's ComputedStats (PCs and
+# NPCs alike) and dropped by the same calls.
+from collections import defaultdict
+from collections.abc import Mapping
+
+from proficiency import ProficiencyType
+# inputs and invalidate() live in stat_inputs so proficiency can import them, re-exported here
+from stat_inputs import (ABILITIES, ALL_ABILITIES, ARMOR_CLASS_INPUTS, CLASSES, CONDITIONS, EQUIPMENT, FEATURES,
+                         PROFICIENCY_BONUS, SPELLCASTING, ability_input, invalidate, proficiency_input)
+
+SKILLS = {
+    "athletics": "STR",
+    "acrobatics": "DEX",
+    "sleight_of_hand": "DEX",
+    "stealth": "DEX",
+    "arcana": "INT",
+    "history": "INT",
+    "investigation": "INT",
+    "nature": "INT",
+    "religion": "INT",
+    "animal_handling": "WIS",
+    "insight": "WIS",
+    "medicine": "WIS",
+    "perception": "WIS",
+    "survival": "WIS",
+    "deception": "CHA",
+    "intimidation": "CHA",
+    "performance": "CHA",
+    "persuasion": "CHA",
+}
+
+SPELLCASTING_ABILITY = {
+    "Artificer": "INT",
+    "Bard": "CHA",
+    "Cleric": "WIS",
+    "Druid": "WIS",
+    "Paladin": "CHA",
+    "Ranger": "WIS",
+    "Sorcerer": "CHA",
+    "Warlock": "CHA",
+    "Wizard": "INT",
+}
+
+
+# ---- Formulas, each takes the owner ----
+
+def _proficient(owner, prof_type, value, ability):
+    bonus = owner.proficiencies.proficiency_bonus if value in owner.proficiencies.proficiencies[prof_type] else 0
+    return owner.ability_scores.modifier(ability) + bonus
+
+
+def _skill(owner, skill):
+    return _proficient(owner, ProficiencyType.SKILL, skill, SKILLS[skill])
+
+
+def _save(owner, ability):
+    return _proficient(owner, ProficiencyType.SAVE, ability, ability)
+
+
+def _modified(owner, stat_name, value):
+    modified = owner.features.dispatch(owner, "modify_stat", stat_name, value)
+    return value if modified is None else modified
+
+
+def _passive_perception(owner):
+    return _modified(owner, "passive_perception", 10 + owner.derived.get(("skill", "perception")))
+
+
+def _initiative(owner):
+    return _modified(owner, "initiative", owner.ability_scores.modifier("DEX"))
+
+
+def spellcasting_ability(owner):
+    """The ability set on the owner's Spellcasting, else the one of its first spellcasting class."""
+    ability = owner.spells.spellcasting_ability
+    if ability is None:
+        ability = next((SPELLCASTING_ABILITY[c] for c in owner.classes.classes if c in SPELLCASTING_ABILITY), None)
+    return ability
+
+
+def _spell_save_dc(owner):
+    ability = spellcasting_ability(owner)
+    if ability is None:
+        return None
+    return 8 + owner.proficiencies.proficiency_bonus + owner.ability_scores.modifier(ability)
+
+
+FORMULAS = {}                   # value name -> (function, args)
+DEPENDENTS = defaultdict(set)   # input -> value names reading it
+
+
+def define(name, inputs, function, *args):
+    FORMULAS[name] = (function, args)
+    for value_input in inputs:
+        DEPENDENTS[value_input].add(name)
+
+
+for _skill_name, _ability in SKILLS.items():
+    define(("skill", _skill_name), [ability_input(_ability), proficiency_input(ProficiencyType.SKILL), PROFICIENCY_BONUS],
+           _skill, _skill_name)
+for _ability in ABILITIES:
+    define(("save", _ability), [ability_input(_ability), proficiency_input(ProficiencyType.SAVE), PROFICIENCY_BONUS],
+           _save, _ability)
+define("passive_perception", [ability_input("WIS"), proficiency_input(ProficiencyType.SKILL), PROFICIENCY_BONUS, FEATURES],
+       _passive_perception)
+define("initiative", [ability_input("DEX"), FEATURES], _initiative)
+define("spell_save_dc", [*ALL_ABILITIES, PROFICIENCY_BONUS, CLASSES, SPELLCASTING], _spell_save_dc)
+
+
+class DerivedStats:
+    __slots__ = ("owner", "_values")
+
+    def __init__(self, owner):
+        self.owner = owner
+        self._values = {}
+
+    def get(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            function, args = FORMULAS[name]
+            value = self._values[name] = function(self.owner, *args)
+            return value
+
+    def invalidate(self, *inputs):
+        values = self._values
+        for value_input in inputs:
+            for name in DEPENDENTS.get(value_input, ()):
+                values.pop(name, None)
+
+    def reset(self, kind=None):
+        """Drop every cached value, or those of one kind ("skill", "save")."""
+        if kind is None:
+            self._values.clear()
+        else:
+            for name in [n for n in self._values if isinstance(n, tuple) and n[0] == kind]:
+                del self._values[name]
+
+
+class DerivedView(Mapping):
+    """Read-only {key: value} over one kind of derived value, e.g. pc.skill_scores["stealth"]."""
+
+    def __init__(self, derived, kind, keys):
+        self.derived = derived
+        self.kind = kind
+        self._keys = keys
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return self.derived.get((self.kind, key))
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class CacheCounter:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def reset(self):
+        self.hits = self.misses = 0
+
+    def __repr__(self):
+        return f"CacheCounter(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.1%})"
+
+
+# armor_class() lookups of every creature
+armor_class_cache = CacheCounter()
+
+
+class CachedArmorClass:
+    """
+    armor_class() for ComputedStats: computed by _compute_armor_class() on the first call, then
+    served from the cache until invalidate() reports a change to an ability score, equipment, features or conditions.
+    """
+    __slots__ = ("_ac_cache",)
+
+    def __init__(self):
+        self._ac_cache = None
+
+    def armor_class(self):
+        ac = self._ac_cache
+        if ac is None:
+            armor_class_cache.misses += 1
+            ac = self._ac_cache = self._compute_armor_class()
+        else:
+            armor_class_cache.hits += 1
+        return ac
+
+    def invalidate_armor_class(self):
+        self._ac_cache = None
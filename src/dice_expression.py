@@ -0,0 +1,167 @@
+# Dice expression language, e.g. "2d6+1d4+3", "1d20 adv", "4d6kh3", "(2d6)".
+# Expressions are compiled once into a RollPlan and cached by string, so repeated
+# GM tool calls with the same expression skip parsing entirely.
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+import roll_events
+from game_engine import Dice, RollResult, BatchRollResult
+
+_TERM = re.compile(r"\s*([+-])?\s*(?:(\d*)d(\d+)(?:(kh|kl|dh|dl|k)(\d+))?|(\d+))\s*", re.IGNORECASE)
+_ADVANTAGE = re.compile(r"\s+(adv|dis|advantage|disadvantage)\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class DiceTerm:
+    sides: int
+    count: int
+    sign: int = 1                 # +1 or -1
+    keep: Optional[int] = None    # number of dice kept, None keeps all
+    keep_highest: bool = True
+
+
+@dataclass(frozen=True)
+class RollPlan:
+    expression: str
+    terms: Tuple[DiceTerm, ...]
+    modifier: int = 0
+    advantage: Optional[str] = None
+
+    @property
+    def simple(self) -> bool:
+        """True if the plan is a plain sum of dice, i.e. DiceHandler.roll can run it."""
+        return all(t.sign == 1 and t.keep is None for t in self.terms)
+
+    @property
+    def dice_specs(self):
+        """[(sides, count), ...] as taken by DiceHandler.roll and probability.roll_pmf."""
+        return [(t.sides, t.count) for t in self.terms]
+
+    def _term_advantage(self, i):
+        return self.advantage if i == self._advantage_term else None
+
+    @property
+    def _advantage_term(self):
+        # advantage applies to the first 1d20 in the expression
+        for i, t in enumerate(self.terms):
+            if t.sides == 20 and t.count == 1:
+                return i
+        return None
+
+    def roll(self) -> RollResult:
+        """Roll once through the scalar Dice.roll path, the sink gets one "roll" event for the whole expression."""
+        result = None
+        for i, term in enumerate(self.terms):
+            term_roll = Dice.roll(sides=term.sides, count=term.count, advantage=self._term_advantage(i), emit=False)
+            if term.keep is not None:
+                kept = sorted(term_roll.dice, reverse=term.keep_highest)[:term.keep]
+                term_roll.base_total = sum(kept)
+            term_roll.base_total *= term.sign
+            if result is None:
+                result = term_roll
+            else:
+                result.add_roll(term_roll)
+
+        if result is None:
+            result = RollResult(dice=[], base_total=0)
+        result.add_modifier(self.modifier)
+
+        if roll_events.sink.enabled:
+            roll_events.sink.emit("roll", result)
+        return result
+
+    def roll_many(self, n) -> BatchRollResult:
+        """Roll n times through the vectorized Dice.roll_many path."""
+        result = None
+        for i, term in enumerate(self.terms):
+            term_roll = Dice.roll_many(sides=term.sides, count=term.count, n=n, advantage=self._term_advantage(i))
+            if term.keep is not None:
+                ordered = np.sort(term_roll.dice, axis=1)
+                if term.keep_highest:
+                    kept = ordered[:, term.count - term.keep:]
+                else:
+                    kept = ordered[:, :term.keep]
+                term_roll.base_totals = kept.sum(axis=1, dtype=np.int32)
+            term_roll.base_totals = term_roll.base_totals * term.sign
+            if result is None:
+                result = term_roll
+            else:
+                result.add_roll(term_roll)
+
+        if result is None:
+            result = BatchRollResult(dice=np.zeros((n, 0), dtype=np.int32),
+                                     base_totals=np.zeros(n, dtype=np.int32),
+                                     modifiers=np.zeros(n, dtype=np.int32),
+                                     is_critical=np.zeros(n, dtype=bool))
+        result.add_modifier(self.modifier)
+        return result
+
+
+def _parse(expression) -> RollPlan:
+    text = expression.strip().lower().replace("(", " ").replace(")", " ").strip()
+
+    advantage = None
+    adv_match = _ADVANTAGE.search(text)
+    if adv_match:
+        advantage = "adv" if adv_match.group(1).startswith("adv") else "dis"
+        text = text[:adv_match.start()]
+
+    terms = []
+    modifier = 0
+    pos = 0
+    while pos < len(text):
+        match = _TERM.match(text, pos)
+        if not match or match.end() == pos or (pos > 0 and not match.group(1)):
+            raise ValueError(f"Invalid dice expression: {expression!r}")
+        sign, count, sides, keep_mode, keep_n, flat = match.groups()
+        sign = -1 if sign == "-" else 1
+
+        if flat is not None:
+            modifier += sign * int(flat)
+        else:
+            count = int(count) if count else 1
+            sides = int(sides)
+            if count < 1 or sides < 1:
+                raise ValueError(f"Invalid dice expression: {expression!r}")
+            keep = None
+            keep_highest = True
+            if keep_mode:
+                keep_n = int(keep_n)
+                if keep_mode in ("kh", "k"):
+                    keep = keep_n
+                elif keep_mode == "kl":
+                    keep, keep_highest = keep_n, False
+                elif keep_mode == "dl":
+                    keep = count - keep_n
+                else:  # dh
+                    keep, keep_highest = count - keep_n, False
+                if not (0 <= keep <= count):
+                    raise ValueError(f"Cannot keep {keep} of {count} dice in {expression!r}")
+            terms.append(DiceTerm(sides=sides, count=count, sign=sign, keep=keep, keep_highest=keep_highest))
+        pos = match.end()
+
+    if not terms and not modifier:
+        raise ValueError(f"Invalid dice expression: {expression!r}")
+
+    plan = RollPlan(expression=expression, terms=tuple(terms), modifier=modifier, advantage=advantage)
+    if advantage is not None and plan._advantage_term is None:
+        raise ValueError("advantage must be for a one d20 roll")
+    return plan
+
+
+@lru_cache(maxsize=512)
+def compile_expression(expression) -> RollPlan:
+    """Parse a dice expression into a reusable RollPlan (cached per expression string)."""
+    return _parse(expression)
+
+
+def roll_expression(expression) -> RollResult:
+    return compile_expression(expression).roll()
+
+
+def roll_expression_many(expression, n) -> BatchRollResult:
+    return compile_expression(expression).roll_many(n)
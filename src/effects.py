@@ -1,13 +1,15 @@
 class EffectsManager:
+    __slots__ = ("owner", "effects")
+
     def __init__(self, owner):
         self.owner = owner
-        self.effectss = []
+        self.effects = []
 
     def add(self, effects):
         self.effects.append(effects)
 
     def remove(self, effects_type):
-        self.effectss = [
+        self.effects = [
             c for c in self.effects if not isinstance(c, effects_type)
         ]
 
@@ -3,15 +3,25 @@ from proficiency import ProficiencyType
 import resources
 import actions
 from typing import Optional, Callable, Dict
-import random
+import rng
+import derived_stats
+from name_index import normalize_name
 
 class FeatureManager:
+    __slots__ = ("owner", "_features", "_hooks", "roll_features")
+
     def __init__(self, owner):
         self.owner = owner
         self._features = []
+        # hook name -> features that actually override that hook
+        self._hooks = {}
+        # features the dice engine has to run on rolls (feature_type "affects_rolls")
+        self.roll_features = []
 
     def add_feature(self, feature, engine,description=None):
-        # First check if in Feature registry
+        # First check if in Feature registry, names differing only in case, spacing or " (Copy)" count
+        if feature not in FEATURE_REGISTRY:
+            feature = FEATURE_KEYS.get(normalize_name(feature), feature)
         if feature not in FEATURE_REGISTRY:
             print("Feature does not exist or has not yet been implemented in the feature registry")
             # create a descriptive feature for now
@@ -24,7 +34,9 @@ class FeatureManager:
         
         if feature_class not in self._features:
             self._features.append(feature_class)
+            self._index(feature_class)
             feature_class.on_attach(engine) # add permanent character level changes
+            derived_stats.invalidate(self.owner, derived_stats.FEATURES)
 
     def get(self, feature_name):
         return next((obj for obj in self._features if obj.name == feature_name), None)
@@ -33,15 +45,46 @@ class FeatureManager:
         if feature in self._features:
             feature.on_detach(engine)
             self._features.remove(feature) # remove permanent character level changes
+            self._unindex(feature)
+            derived_stats.invalidate(self.owner, derived_stats.FEATURES)
+
+    def _index(self, feature):
+        for hook_name in overridden_hooks(type(feature)):
+            self._hooks.setdefault(hook_name, []).append(feature)
+        if feature.feature_type == "affects_rolls":
+            self.roll_features.append(feature)
+
+    def _unindex(self, feature):
+        for hook_name in overridden_hooks(type(feature)):
+            self._hooks[hook_name].remove(feature)
+            if not self._hooks[hook_name]:
+                del self._hooks[hook_name]
+        if feature in self.roll_features:
+            self.roll_features.remove(feature)
+
+    def modify_ac(self, engine, ac):
+        """ac passed through every feature that overrides modify_ac, in the order they were added."""
+        for feature in self._hooks.get("modify_ac", []):
+            ac = feature.modify_ac(engine, ac)
+        return ac
+
+    def features_for(self, hook_name):
+        """Features that override hook_name, in the order they were added."""
+        return self._hooks.get(hook_name, [])
 
     def dispatch(self, engine, hook_name, *args, **kwargs):
         """
-        Generic hook dispatcher.
+        Generic hook dispatcher. Only features that override the hook are called,
+        the Feature base implementations are no-ops.
         """
         result = None
 
-        for feature in self._features:
-            hook = getattr(feature, hook_name, None)
+        if hook_name in FEATURE_HOOKS:
+            hooks = [getattr(feature, hook_name) for feature in self._hooks.get(hook_name, [])]
+        else:
+            hooks = [getattr(feature, hook_name, None) for feature in self._features]
+
+        for hook in hooks:
             if callable(hook):
                 value = hook(engine, *args, **kwargs)
                 if value is not None:
@@ -142,19 +185,50 @@ class Feature:
         pass
 
 
+# Every hook a Feature subclass can override
+FEATURE_HOOKS = frozenset(
+    name for name, value in vars(Feature).items()
+    if callable(value) and not name.startswith("_")
+)
+
+_overridden_hooks_cache = {}
+
+
+def overridden_hooks(feature_class):
+    """Names of the hooks feature_class overrides, computed once per class."""
+    hooks = _overridden_hooks_cache.get(feature_class)
+    if hooks is None:
+        hooks = tuple(
+            name for name in sorted(FEATURE_HOOKS)
+            if getattr(feature_class, name) is not getattr(Feature, name)
+        )
+        _overridden_hooks_cache[feature_class] = hooks
+    return hooks
+
+
 ###################################################################################################
 # Build feature subclass only when necessary, otherwise it is just a data holder (description only)
 ###################################################################################################
     
 # Features that affect dice rolls need to take rolls, total as input and output new rolls and new totals
 class HalflingLuck(Feature):
+    reroll_ones = True  # lets the hit chance tables account for this feature
+
     def __init__(self):
         super().__init__("Halfling Luck", source="race",feature_type="affects_rolls")
 
     def on_d20_roll(self,roll_result):
         # reroll any 1s 
-        roll_result.dice = [r if r > 1 else random.randint(2, 20) for r in roll_result.dice]
-        roll_result.base_total = sum(roll_result.dice )
+        roll_result.dice = [r if r > 1 else rng.current().randint(2, 20) for r in roll_result.dice]
+        # keep the adv/dis choice between the two d20s
+        if roll_result.advantage == "adv":
+            roll_result.base_total = max(roll_result.dice)
+        elif roll_result.advantage == "dis":
+            roll_result.base_total = min(roll_result.dice)
+        else:
+            roll_result.base_total = sum(roll_result.dice )
+        if roll_result.advantage or len(roll_result.dice) == 1:
+            roll_result.is_critical = roll_result.base_total == 20
         return roll_result
     
 class FelineAgility(Feature):
@@ -210,4 +284,7 @@ FEATURE_REGISTRY = {
     "Luck": HalflingLuck,
 }
 
+# normalized name -> registry key
+FEATURE_KEYS = {normalize_name(name): name for name in FEATURE_REGISTRY}
+
 
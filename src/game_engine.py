@@ -1,8 +1,11 @@
-import random as random
 from abc import ABC, abstractmethod
+from array import array
 from typing import Optional, Dict, List
-from dataclasses import dataclass, field
-from proficiency import ProficiencyType
+from dataclasses import dataclass
+import numpy as np
+import roll_events
+import rng
+import probability
 from enum import Enum, auto
 
 
@@ -26,26 +29,69 @@ class DamageType(Enum):
     POISON = auto()
     PSYCHIC = auto()
 
-@dataclass
+def _pack_dice(values):
+    # one byte per die covers everything up to a d100, bigger dice fall back to machine ints
+    try:
+        return array("B", values)
+    except OverflowError:
+        return array("l", values)
+
+
 class RollResult:
-    dice: List[int]
-    base_total: int
-    modifiers: int = 0
-    advantage: Optional[str] = None
-    is_critical: bool = False
-    metadata: Dict = field(default_factory=dict)
+    """
+    Result of a single roll. Slot based since combat logs keep a lot of these:
+    dice are stored as a small int array and metadata is only created when used.
+    """
+    __slots__ = ("_dice", "base_total", "modifiers", "advantage", "is_critical", "_metadata")
+
+    def __init__(self, dice, base_total, modifiers=0, advantage=None, is_critical=False, metadata=None):
+        self.dice = dice
+        self.base_total = base_total
+        self.modifiers = modifiers
+        self.advantage = advantage
+        self.is_critical = is_critical
+        self._metadata = metadata or None
+
     def __repr__(self) -> str:
         return (
             f"RollResult("
             f"total={self.total}, "
-            f"dice={self.dice}, "
+            f"dice={list(self._dice)}, "
             f"dice_total={self.base_total}, "
             f"modifiers={self.modifiers}, "
             f"advantage={self.advantage}, "
             f"is_critical={self.is_critical}, "
-            f"metadata={self.metadata}"
+            f"metadata={self._metadata or {}}"
             f")")
 
+    def __eq__(self, other):
+        if not isinstance(other, RollResult):
+            return NotImplemented
+        return (list(self._dice), self.base_total, self.modifiers, self.advantage,
+                self.is_critical, self._metadata or {}) == (
+                list(other._dice), other.base_total, other.modifiers, other.advantage,
+                other.is_critical, other._metadata or {})
+
+    @property
+    def dice(self):
+        # stored packed, handed out as a plain list (json, concatenation)
+        return self._dice.tolist()
+
+    @dice.setter
+    def dice(self, values):
+        self._dice = _pack_dice(values)
+
+    @property
+    def metadata(self) -> Dict:
+        # created on first access
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @property
+    def has_metadata(self) -> bool:
+        return bool(self._metadata)
+
     @property
     def total(self) -> int:
         return self.base_total + self.modifiers
@@ -57,7 +103,13 @@ class RollResult:
         self.metadata[key] = value
 
     def add_roll(self,roll_result):
-        self.dice.extend(roll_result.dice)
+        dice = roll_result._dice
+        if dice.typecode != self._dice.typecode:
+            # widen the byte array before big dice go in, never after a partial extend
+            if self._dice.typecode == "B":
+                self._dice = array(dice.typecode, self._dice)
+            dice = dice.tolist()
+        self._dice.extend(dice)
         self.base_total += roll_result.base_total
 
 @dataclass
@@ -68,61 +120,206 @@ class AttackResult:
     damage: Optional[Dict[str, RollResult]] = None
 
 @dataclass
+class AttackBatchResult:
+    """
+    Columnar result of DiceHandler.roll_attacks, one row per attack.
+    damage[i, e] is the damage of the action's e-th damage entry (0 on a miss).
+    """
+    attack_rolls: "BatchRollResult"
+    hits: np.ndarray
+    damage: np.ndarray
+    damage_types: List
+
+    def __len__(self) -> int:
+        return len(self.hits)
+
+    @property
+    def is_critical(self) -> np.ndarray:
+        return self.attack_rolls.is_critical
+
+    @property
+    def damage_totals(self) -> np.ndarray:
+        return self.damage.sum(axis=1)
+
+    @property
+    def total(self) -> int:
+        return int(self.damage.sum())
+
+    def breakdown(self) -> Dict:
+        """Return the total damage dealt for each damage type across all attacks."""
+        result = {}
+        for e, dt in enumerate(self.damage_types):
+            result[dt] = result.get(dt, 0) + int(self.damage[:, e].sum())
+        return result
+
 class DamageResult:
-    damage: Dict["DamageType", List["RollResult"]] = field(default_factory=dict)
+    """
+    Damage rolls grouped by damage type. Subtotals are kept up to date in
+    add_damage, so total and breakdown() don't re-sum the rolls.
+    """
+    __slots__ = ("damage", "_subtotals", "_total")
+
+    def __init__(self, damage: Optional[Dict["DamageType", List["RollResult"]]] = None):
+        self.damage: Dict["DamageType", List["RollResult"]] = {}
+        self._subtotals: Dict["DamageType", int] = {}
+        self._total = 0
+        for dmg_type, rolls in (damage or {}).items():
+            for roll_result in rolls:
+                self.add_damage(dmg_type, roll_result)
+
+    def __repr__(self) -> str:
+        return f"DamageResult(damage={self.damage})"
+
+    def __eq__(self, other):
+        if not isinstance(other, DamageResult):
+            return NotImplemented
+        return self.damage == other.damage
 
     @property
     def total(self) -> int:
         """Return the total of all rolls for all damage types."""
-        return sum(
-            subroll.total
-            for rolls in self.damage.values()
-            for subroll in rolls
-        )
+        return self._total
 
     def breakdown(self) -> Dict["DamageType", int]:
         """Return a subtotal for each damage type."""
-        return {
-            dt: sum(subroll.total for subroll in rolls)
-            for dt, rolls in self.damage.items()
-        }
+        return dict(self._subtotals)
 
     def add_damage(self, dmg_type: "DamageType", roll_result: "RollResult"):
         """Add a roll result to a specific damage type."""
         if dmg_type not in self.damage:
             self.damage[dmg_type] = []
+            self._subtotals[dmg_type] = 0
         self.damage[dmg_type].append(roll_result)
+        self._subtotals[dmg_type] += roll_result.total
+        self._total += roll_result.total
+
+
+class PackedRolls:
+    """
+    Archive form of a list of RollResults: one fixed size numpy record per roll
+    plus a single flat array with every die. Metadata is not kept.
+    """
+    ROW = np.dtype([("base_total", np.int32),
+                    ("modifiers", np.int32),
+                    ("advantage", np.int8),
+                    ("is_critical", np.bool_),
+                    ("dice_start", np.uint32),
+                    ("dice_count", np.uint16)])
+    ADVANTAGE_CODES = {None: 0, "adv": 1, "dis": 2}
+    ADVANTAGE_NAMES = {0: None, 1: "adv", 2: "dis"}
+
+    def __init__(self, rows, dice):
+        self.rows = rows
+        self.dice = dice
+
+    @classmethod
+    def from_rolls(cls, rolls):
+        rolls = list(rolls)
+        rows = np.empty(len(rolls), dtype=cls.ROW)
+        counts = np.fromiter((len(r.dice) for r in rolls), dtype=np.uint16, count=len(rolls))
+        rows["base_total"] = [r.base_total for r in rolls]
+        rows["modifiers"] = [r.modifiers for r in rolls]
+        rows["advantage"] = [cls.ADVANTAGE_CODES[r.advantage] for r in rolls]
+        rows["is_critical"] = [r.is_critical for r in rolls]
+        rows["dice_count"] = counts
+        rows["dice_start"] = np.cumsum(counts, dtype=np.uint32) - counts
+        dice = np.fromiter((d for r in rolls for d in r.dice), dtype=np.uint16, count=int(counts.sum()))
+        return cls(rows, dice)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, i) -> RollResult:
+        row = self.rows[i]
+        start = int(row["dice_start"])
+        return RollResult(dice=self.dice[start:start + int(row["dice_count"])].tolist(),
+                          base_total=int(row["base_total"]),
+                          modifiers=int(row["modifiers"]),
+                          advantage=self.ADVANTAGE_NAMES[int(row["advantage"])],
+                          is_critical=bool(row["is_critical"]))
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.rows["base_total"] + self.rows["modifiers"]
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.dice.nbytes
+
+    def save(self, path):
+        np.savez_compressed(path, rows=self.rows, dice=self.dice)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["rows"], data["dice"])
+
+
+@dataclass
+class BatchRollResult:
+    """
+    Columnar result of n independent rolls of the same dice expression.
+    Row i of every array describes the i-th roll.
+    """
+    dice: np.ndarray                 # (n, dice rolled per roll)
+    base_totals: np.ndarray          # (n,) dice total after adv/dis is resolved
+    modifiers: np.ndarray            # (n,) flat bonuses
+    is_critical: np.ndarray          # (n,) bool
+    advantage: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.base_totals)
+
+    @property
+    def totals(self) -> np.ndarray:
+        return self.base_totals + self.modifiers
+
+    def add_modifier(self, value):
+        # value can be an int or an array with one entry per roll
+        self.modifiers = self.modifiers + value
+
+    def add_roll(self, batch_result):
+        self.dice = np.hstack((self.dice, batch_result.dice))
+        self.base_totals = self.base_totals + batch_result.base_totals
+
+    def row(self, i) -> RollResult:
+        """Materialize a single roll as a regular RollResult."""
+        return RollResult(
+            dice=self.dice[i].tolist(),
+            base_total=int(self.base_totals[i]),
+            modifiers=int(self.modifiers[i]),
+            advantage=self.advantage,
+            is_critical=bool(self.is_critical[i]))
 
 
 
 class Dice:
     @staticmethod
-    def roll(sides=20, count=1,advantage=None):
+    def roll(sides=20, count=1,advantage=None, emit=True):
+        # emit=False for rolls DiceHandler reports itself as a "roll", "attack" or "damage" event
+        randint = rng.current().randint
         if advantage is None:
-            results = [random.randint(1, sides) for _ in range(count)]
-            print(f"Individual rolls: {results}")
-            print(f"Total: {sum(results)}")
+            results = [randint(1, sides) for _ in range(count)]
             if (len(results)==1 and results[0]==20):
                 crit=True
             else:
                 crit=False
-            return RollResult(
+            result = RollResult(
                 dice=results,
                 base_total=sum(results),
                 is_critical=crit)
             
-        if advantage=="adv":
+        elif advantage=="adv":
             if (count!=1 or sides!=20):
                 raise ValueError("advantage must be for a one d20 roll")
             else:
-                r1 = random.randint(1, sides)
-                r2 = random.randint(1, sides)
-                print(f"Rolled: {r1} and {r2} -> taking {'highest' if advantage=="adv" else 'lowest'}: {max(r1, r2)}")
+                r1 = randint(1, sides)
+                r2 = randint(1, sides)
                 if max(r1, r2)==20:
                     crit=True
                 else:
                     crit=False
-                return  RollResult(
+                result = RollResult(
                     dice=[r1,r2],
                     base_total=max(r1, r2),
                     advantage="adv",
@@ -132,16 +329,14 @@ class Dice:
             if (count!=1 or sides!=20):
                 raise ValueError("advantage must be for a one d20 roll")
             else:
-                r1 = random.randint(1, sides)
-                r2 = random.randint(1, sides)
-                print(f"Rolled: {r1} and {r2} -> taking {'highest' if advantage=="adv" else 'lowest'}: {min(r1, r2)}")
-
+                r1 = randint(1, sides)
+                r2 = randint(1, sides)
                 if min(r1, r2)==20:
                     crit=True
                 else:
                     crit=False
 
-                return RollResult(
+                result = RollResult(
                     dice=[r1,r2],
                     base_total=min(r1, r2),
                     advantage="dis",
@@ -150,6 +345,45 @@ class Dice:
         else:
             raise ValueError("advantage must be one of adv or dis")
 
+        if emit and roll_events.sink.enabled:
+            roll_events.sink.emit("dice", result)
+        return result
+
+    @staticmethod
+    def roll_many(sides=20, count=1, n=1, advantage=None):
+        """
+        Vectorized version of Dice.roll: rolls the same expression n times at once.
+        Same adv/dis and critical rules as Dice.roll, nothing is sent to the roll sink.
+        """
+        stream = rng.current()
+        if advantage is None:
+            dice = stream.block(sides, (n, count))
+            base_totals = dice.sum(axis=1, dtype=np.int32)
+            if count == 1:
+                crit = dice[:, 0] == 20
+            else:
+                crit = np.zeros(n, dtype=bool)
+
+        elif advantage in ("adv", "dis"):
+            if (count!=1 or sides!=20):
+                raise ValueError("advantage must be for a one d20 roll")
+            dice = stream.block(sides, (n, 2))
+            if advantage == "adv":
+                base_totals = dice.max(axis=1)
+            else:
+                base_totals = dice.min(axis=1)
+            crit = base_totals == 20
+
+        else:
+            raise ValueError("advantage must be one of adv or dis")
+
+        return BatchRollResult(
+            dice=dice,
+            base_totals=base_totals,
+            modifiers=np.zeros(n, dtype=np.int32),
+            is_critical=crit,
+            advantage=advantage)
+
 
 class DiceHandler:
     """
@@ -174,9 +408,9 @@ class DiceHandler:
         for sides, count in dice_specs:
             # Call Dice.roll() with count, sides, and advantage
             if counter==0:
-                result = Dice.roll(sides=sides, count=count, advantage=advantage)
+                result = Dice.roll(sides=sides, count=count, advantage=advantage, emit=False)
             else:
-                result.add_roll(Dice.roll(sides=sides, count=count, advantage=advantage))
+                result.add_roll(Dice.roll(sides=sides, count=count, advantage=advantage, emit=False))
             counter +=1
 
 
@@ -189,10 +423,38 @@ class DiceHandler:
         # Apply modifiers
         result.add_modifier(modifiers)        
         
-        # Print debug info
-        print(f"Final rolls: {result.dice}")
-        print(f"Total after modifiers/features: {result.total}")
+        if roll_events.sink.enabled:
+            roll_events.sink.emit("roll", result)
+
+        return result
+
+    def roll_batch(self, dice_specs, modifiers=0, n=1, advantage=None):
+        """
+        Batch version of roll(): rolls the dice_specs expression n times.
+        dice_specs: list of tuples [(sides, count), ...]
+        modifiers: int, or array of length n for per-roll bonuses
+        advantage: passed through to Dice.roll_many() for the single d20 specs only
+
+        Returns: BatchRollResult with one row per roll
+        """
+        if not dice_specs:
+            # nothing to roll, every row is just the modifiers
+            result = BatchRollResult(dice=np.zeros((n, 0), dtype=np.int32),
+                                     base_totals=np.zeros(n, dtype=np.int32),
+                                     modifiers=np.zeros(n, dtype=np.int32),
+                                     is_critical=np.zeros(n, dtype=bool))
+            result.add_modifier(modifiers)
+            return result
+
+        result = None
+        for sides, count in dice_specs:
+            spec_advantage = advantage if (sides, count) == (20, 1) else None
+            if result is None:
+                result = Dice.roll_many(sides=sides, count=count, n=n, advantage=spec_advantage)
+            else:
+                result.add_roll(Dice.roll_many(sides=sides, count=count, n=n, advantage=spec_advantage))
 
+        result.add_modifier(modifiers)
         return result
     
 
@@ -206,38 +468,29 @@ class DiceHandler:
         Returns: dict with rolls and final total
         """
 
-        attack_result = Dice.roll(sides=20, count=1, advantage=advantage)
+        attack_result = Dice.roll(sides=20, count=1, advantage=advantage, emit=False)
 
 
         # Apply any features - these should only affect the dice?
-        if source.features._features:
-            for feature in source.features._features:
-                if getattr(feature, "feature_type", None) == "affects_rolls":
-                    attack_result = feature(attack_result)
+        for feature in source.features.roll_features:
+            attack_result = feature.on_d20_roll(attack_result)
 
         # Apply modifiers
-        if action.attack_roll.get("precomputed"):
-            attack_result.add_modifier(action.attack_roll["bonus"] )
-        else:
-            if source.proficiencies.has_proficiency( ProficiencyType.WEAPON,action.proficiency_type):
-                prof = source.proficiencies.proficiency_bonus
-            else:
-                prof = 0
-            attack_result.add_modifier(source.ability_scores.modifier(action.attack_roll["ability"]) + action.attack_roll["bonus"] + prof )
+        attack_result.add_modifier(probability.attack_bonus(action, source))
+
+        if roll_events.sink.enabled:
+            roll_events.sink.emit("attack", attack_result)
 
         if attack_result.total>= target.stats.armor_class():
             dmg_result = DamageResult()
             for val in action.damage_roll:
-                temp_dmg_result = Dice.roll(sides=val["dice_type"], count=val["dice_amount"])
-                 # Apply any features - these should only affect the dice?
-                if source.features._features:
-                    for feature in source.features._features:
-                        if getattr(feature, "feature_type", None) == "affects_rolls":
-                            temp_dmg_result = feature(temp_dmg_result) 
-                if val.get("precomputed"):
-                    temp_dmg_result.add_modifier(val["bonus"])
-                else:
-                    temp_dmg_result.add_modifier(val["bonus"] + source.ability_scores.modifier(val["ability"]))
+                temp_dmg_result = Dice.roll(sides=val["dice_type"], count=val["dice_amount"], emit=False)
+                # d20 features (e.g. Halfling Luck) don't touch damage dice, only on_damage_roll does
+                for feature in source.features.features_for("on_damage_roll"):
+                    temp_dmg_result = feature.on_damage_roll(temp_dmg_result)
+                temp_dmg_result.add_modifier(probability.damage_bonus(val, source))
+                if roll_events.sink.enabled:
+                    roll_events.sink.emit("damage", temp_dmg_result)
                 dmg_result.add_damage(val["dmg_type"],temp_dmg_result)
 
             return AttackResult(attack_roll=attack_result,
@@ -250,16 +503,156 @@ class DiceHandler:
                                 is_critical=attack_result.is_critical,
                                 damage=None)
 
+    @staticmethod
+    def _apply_roll_features(batch_result, rows, features_per_row, hook="on_d20_roll"):
+        # Features work on single RollResults, so only rows whose source has
+        # roll-altering features are materialized and written back.
+        for i, features in zip(rows, features_per_row):
+            result = batch_result.row(i)
+            for feature in features:
+                result = getattr(feature, hook)(result)
+            batch_result.dice[i] = result.dice
+            batch_result.base_totals[i] = result.base_total
+            batch_result.is_critical[i] = result.is_critical
+
+    def roll_attacks(self, action, sources, targets, advantage=None):
+        """
+        Batched roll_attack: attack i is sources[i] attacking targets[i].
+        A single source or target (or a list of one) is used for every attack.
+        Modifiers, roll features and target AC are looked up once per creature, all
+        d20s and damage dice are rolled in vectorized blocks.
+
+        Returns: AttackBatchResult with one row per attack
+        """
+        if not isinstance(sources, (list, tuple)):
+            sources = [sources]
+        if not isinstance(targets, (list, tuple)):
+            targets = [targets]
+        n = max(len(sources), len(targets))
+        if len(sources) == 1:
+            sources = list(sources) * n
+        if len(targets) == 1:
+            targets = list(targets) * n
+        if len(sources) != len(targets):
+            raise ValueError("sources and targets must have the same length, or one of them a single creature")
+
+        damage_entries = action.damage_roll or []
+        attack_mods = np.empty(n, dtype=np.int32)
+        damage_mods = np.empty((n, len(damage_entries)), dtype=np.int32)
+        armor_classes = np.empty(n, dtype=np.int32)
+        feature_rows, row_features = [], []
+        damage_feature_rows, row_damage_features = [], []
+
+        per_source, per_target = {}, {}
+        for i, (source, target) in enumerate(zip(sources, targets)):
+            key = id(source)
+            if key not in per_source:
+                per_source[key] = (
+                    probability.attack_bonus(action, source),
+                    [probability.damage_bonus(val, source) for val in damage_entries],
+                    list(source.features.roll_features),
+                    list(source.features.features_for("on_damage_roll")))
+            attack_mod, damage_mod, features, damage_features = per_source[key]
+            attack_mods[i] = attack_mod
+            damage_mods[i] = damage_mod
+            if features:
+                feature_rows.append(i)
+                row_features.append(features)
+            if damage_features:
+                damage_feature_rows.append(i)
+                row_damage_features.append(damage_features)
+
+            key = id(target)
+            if key not in per_target:
+                per_target[key] = target.stats.armor_class()
+            armor_classes[i] = per_target[key]
+
+        attack_rolls = Dice.roll_many(sides=20, count=1, n=n, advantage=advantage)
+        self._apply_roll_features(attack_rolls, feature_rows, row_features)
+        attack_rolls.add_modifier(attack_mods)
+        hits = attack_rolls.totals >= armor_classes
+
+        damage = np.zeros((n, len(damage_entries)), dtype=np.int32)
+        for e, val in enumerate(damage_entries):
+            damage_rolls = Dice.roll_many(sides=val["dice_type"], count=val["dice_amount"], n=n)
+            self._apply_roll_features(damage_rolls, damage_feature_rows, row_damage_features, "on_damage_roll")
+            damage[:, e] = np.where(hits, damage_rolls.base_totals + damage_mods[:, e], 0)
+
+        return AttackBatchResult(attack_rolls=attack_rolls,
+                                 hits=hits,
+                                 damage=damage,
+                                 damage_types=[val["dmg_type"] for val in damage_entries])
+
+
+
+
+class HitChanceTable:
+    """
+    Dense P(hit) / P(crit) lookup for d20 attacks, indexed by
+    [reroll_ones, roll state, attack bonus, AC]. Built once on first use, see hit_chance_table().
+    Out of range bonuses/ACs fall back to probability.hit_probability.
+    """
+    ROLL_STATES = {None: 0, "adv": 1, "dis": 2}
+
+    def __init__(self, min_bonus=-5, max_bonus=20, min_ac=5, max_ac=30):
+        self.min_bonus, self.max_bonus = min_bonus, max_bonus
+        self.min_ac, self.max_ac = min_ac, max_ac
 
+        bonuses = np.arange(min_bonus, max_bonus + 1)
+        acs = np.arange(min_ac, max_ac + 1)
+        # natural roll needed to hit, 21 = cannot hit
+        needed = np.clip(acs[None, :] - bonuses[:, None], 1, 21)
+
+        self.hit = np.empty((2, len(self.ROLL_STATES), len(bonuses), len(acs)))
+        self.crit = np.empty((2, len(self.ROLL_STATES)))
+        for luck in (0, 1):
+            for advantage, state in self.ROLL_STATES.items():
+                probs = probability.d20_pmf(advantage, bool(luck)).probs
+                # at_least[k - 1] = P(natural roll >= k), k = 1..21
+                at_least = np.clip(np.append(np.cumsum(probs[::-1])[::-1], 0.0), 0.0, 1.0)
+                self.hit[luck, state] = at_least[needed - 1]
+                self.crit[luck, state] = probs[19]
+
+    def lookup(self, bonus, ac, advantage=None, reroll_ones=False):
+        """Returns (P(hit), P(crit)), same rules as DiceHandler.roll_attack."""
+        if not (self.min_bonus <= bonus <= self.max_bonus and self.min_ac <= ac <= self.max_ac):
+            return probability.hit_probability(bonus, ac, advantage, reroll_ones=reroll_ones)
+        state = self.ROLL_STATES[advantage]
+        return (float(self.hit[int(reroll_ones), state, bonus - self.min_bonus, ac - self.min_ac]),
+                float(self.crit[int(reroll_ones), state]))
+
+    def hit_chance(self, bonus, ac, advantage=None, reroll_ones=False):
+        return self.lookup(bonus, ac, advantage, reroll_ones)[0]
+
+    def crit_chance(self, advantage=None, reroll_ones=False):
+        return float(self.crit[int(reroll_ones), self.ROLL_STATES[advantage]])
+
+    def for_attack(self, action, source, target, advantage=None):
+        """(P(hit), P(crit)) for source attacking target with action, without rolling."""
+        return self.lookup(probability.attack_bonus(action, source),
+                           target.stats.armor_class(), advantage, probability.rerolls_ones(source))
+
+
+_hit_chance_table = None
+
+
+def hit_chance_table() -> HitChanceTable:
+    """The shared HitChanceTable, built on first use."""
+    global _hit_chance_table
+    if _hit_chance_table is None:
+        _hit_chance_table = HitChanceTable()
+    return _hit_chance_table
 
 
 class CombatTracker:
-    def __init__(self):
-        self.combatants: set[str] = set()
-        self.initiative_order: list[str] = []  # list of combatant IDs
+    def __init__(self, combatants=None):
+        self.combatants: dict[int, object] = {}  # combatant ID -> combatant
+        self.initiative_order: list[int] = []  # list of combatant IDs
         self.current_turn_index: int = 0
         self.round_number: int = 1
         self.active: bool = False
+        for combatant in combatants or []:
+            self.combatants[id(combatant)] = combatant
         self.initiatives = self.get_initiatives()
         self._recalculate_initiative()
     # -----------------------
@@ -267,18 +660,37 @@ class CombatTracker:
     # -----------------------
 
     def add_combatant(self, combatant):
-        self.combatants.add(combatant)
-        self._recalculate_initiative()
+        cid = id(combatant)
+        if cid not in self.combatants:
+            self.combatants[cid] = combatant
+            self.initiatives[cid] = self.roll_initiative(combatant)
+            self._recalculate_initiative()
 
     def remove_combatant(self, combatant):
-        if combatant in self.combatants:
-            self.combatants.remove(combatant)
+        cid = id(combatant)
+        if cid in self.combatants:
+            # step back when someone earlier in the order (or the current combatant) drops out,
+            # so next_turn() lands on whoever came after them
+            if self.initiative_order.index(cid) <= self.current_turn_index:
+                self.current_turn_index -= 1
+            del self.combatants[cid]
+            del self.initiatives[cid]
             self._recalculate_initiative()
+            if self.current_turn_index >= len(self.initiative_order):
+                self.current_turn_index = 0
+
+    @staticmethod
+    def roll_initiative(combatant):
+        if hasattr(combatant, "roll_initiative"):
+            return combatant.roll_initiative()
+        return DiceHandler().roll(dice_specs=[(20,1)],
+                                  modifiers=combatant.ability_scores.modifier("DEX")).total
 
     def get_initiatives(self):
         initiatives = dict()
-        for combatant in self.combatants:
-            initiatives[combatant.name] = combatant.roll_initiative()
+        for cid, combatant in self.combatants.items():
+            initiatives[cid] = self.roll_initiative(combatant)
+        return initiatives
 
     def _recalculate_initiative(self):
         self.initiative_order = sorted(
@@ -314,7 +726,7 @@ class CombatTracker:
             self.round_number += 1
 
         current = self.get_current_combatant()
-        if current:
+        if current and hasattr(current, "reset_turn_resources"):
             current.reset_turn_resources()
 
 # @dataclass
@@ -1,14 +1,114 @@
-import re 
-def normalize_fg(obj):
-    if isinstance(obj, dict):
-        if "#text" in obj and len(obj) <= 2:
-            return obj["#text"]
-        return {k: normalize_fg(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [normalize_fg(x) for x in obj]
-    else:
-        return obj
-    
+import json
+import re
+
+
+def _to_number(text):
+    try:
+        return int(text)
+    except (TypeError, ValueError):
+        try:
+            return float(text)
+        except (TypeError, ValueError):
+            return text
+
+
+# FG "@type" -> coercion applied to the text of a collapsed node
+FG_TYPES = {"number": _to_number}
+
+
+class FGNormalizer:
+    """
+    Converts FG xml-as-json records: {"@type": ..., "#text": ...} leaves collapse to their text,
+    coerced by FG_TYPES, every other node is kept. The rule is compiled once into `hook`, a json
+    object_hook, so files are normalized in the same pass that decodes them.
+    collapse_all also collapses nodes with extra attributes (links), as the NPC stat blocks want.
+    """
+
+    def __init__(self, collapse_all=False, types=None):
+        self.collapse_all = collapse_all
+        self.types = dict(FG_TYPES if types is None else types)
+        self.hook = self._compile()
+
+    def _compile(self):
+        types = self.types
+        if self.collapse_all:
+            def hook(obj):
+                if "#text" in obj:
+                    convert = types.get(obj.get("@type"))
+                    return convert(obj["#text"]) if convert else obj["#text"]
+                return obj
+        else:
+            def hook(obj):
+                if "#text" in obj and len(obj) <= 2:
+                    convert = types.get(obj.get("@type"))
+                    return convert(obj["#text"]) if convert else obj["#text"]
+                return obj
+        return hook
+
+    def load(self, f):
+        return json.load(f, object_hook=self.hook)
+
+    def loads(self, s):
+        return json.loads(s, object_hook=self.hook)
+
+    def normalize(self, value):
+        """Normalized copy of an already decoded value, walked iteratively."""
+        hook = self.hook
+        out = [None]
+        stack = [(value, out, 0)]
+        pending = []    # dict copies in pre-order, hooked in reverse so children go first
+        while stack:
+            node, parent, key = stack.pop()
+            if isinstance(node, dict):
+                copy = parent[key] = dict(node)
+                pending.append((copy, parent, key))
+                children = node.items()
+            elif isinstance(node, list):
+                copy = parent[key] = list(node)
+                children = enumerate(node)
+            else:
+                parent[key] = node
+                continue
+            for k, v in children:
+                if isinstance(v, (dict, list)):
+                    stack.append((v, copy, k))
+        for copy, parent, key in reversed(pending):
+            parent[key] = hook(copy)
+        return out[0]
+
+    def __getstate__(self):
+        return {"collapse_all": self.collapse_all, "types": self.types}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
+_DEFAULT_FG = FGNormalizer()
+
+# one converter per record shape
+FG_SHAPES = {
+    "class": _DEFAULT_FG,
+    "spell": _DEFAULT_FG,
+    "item": _DEFAULT_FG,
+    "npc": FGNormalizer(collapse_all=True),
+}
+
+
+def fg_normalizer(shape):
+    try:
+        return FG_SHAPES[shape]
+    except KeyError:
+        raise ValueError(f"Unknown FG record shape {shape!r}, must be one of {sorted(FG_SHAPES)}") from None
+
+
+def load_fg(path, shape):
+    """Decode and normalize an FG json file in a single pass."""
+    with open(path, "r", encoding="utf-8") as f:
+        return fg_normalizer(shape).load(f)
+
+
+def normalize_fg(obj, shape=None):
+    return (fg_normalizer(shape) if shape else _DEFAULT_FG).normalize(obj)
 
 
 def extract_text(value):
@@ -1,7 +1,6 @@
-import json
 from actions import Action
 from features import Feature
-from helper_functions import normalize_fg, clean_item_description, extract_link_text
+from helper_functions import load_fg, clean_item_description, extract_link_text
 from collections import defaultdict
 import re
 
@@ -20,8 +19,7 @@ class Item:
 
 class ItemRepository:
     def __init__(self, path="../data/item.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            raw_data = normalize_fg(json.load(f))
+        raw_data = load_fg(path, "item")
 
         # Create objects
         self.all_items = [Item(item) for item in raw_data]
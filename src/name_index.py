@@ -0,0 +1,140 @@
+# Typo tolerant lookup of entity names (spells, classes, races, backgrounds, NPCs, items,
+# features) for free text coming from the GM. Names are reduced to lowercase alphanumerics
+# ("Fire Bolt (Copy)" -> "firebolt") and matched exactly first, then by trigram overlap.
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+import repositories
+
+_NOT_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(name):
+    """'Fire Bolt (Copy)' -> 'firebolt'"""
+    return _NOT_ALNUM.sub("", str(name).replace(" (Copy)", "").lower())
+
+
+def trigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)} if key else set()
+
+
+@dataclass(frozen=True)
+class NameMatch:
+    kind: str
+    name: str
+    score: float   # 1.0 for an exact (normalized) match, else trigram Dice similarity
+
+
+class NameIndex:
+    def __init__(self, entries=()):
+        self.names = []                         # [(kind, name)]
+        self.sizes = []                         # trigram count per entry
+        self.exact = defaultdict(list)          # normalized key -> entry ids
+        self.postings = defaultdict(list)       # trigram -> entry ids
+        for kind, name in entries:
+            self.add(kind, name)
+
+    def add(self, kind, name):
+        key = normalize_name(name)
+        grams = trigrams(key)
+        entry = len(self.names)
+        self.names.append((kind, name))
+        self.sizes.append(len(grams))
+        self.exact[key].append(entry)
+        for gram in grams:
+            self.postings[gram].append(entry)
+
+    def __len__(self):
+        return len(self.names)
+
+    def matches(self, query, kind=None, limit=5, min_score=0.3):
+        """Best matches for query (optionally of one kind), highest score first."""
+        key = normalize_name(query)
+        exact = [NameMatch(*self.names[e], 1.0) for e in self.exact.get(key, ())
+                 if kind is None or self.names[e][0] == kind]
+        if exact and limit == 1:
+            return exact[:1]
+
+        grams = trigrams(key)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for entry in self.postings.get(gram, ()):
+                overlap[entry] += 1
+
+        found = {(m.kind, m.name) for m in exact}
+        scored = []
+        for entry, shared in overlap.items():
+            entry_kind, name = self.names[entry]
+            if (kind is not None and entry_kind != kind) or (entry_kind, name) in found:
+                continue
+            score = 2 * shared / (len(grams) + self.sizes[entry])
+            if score >= min_score:
+                scored.append(NameMatch(entry_kind, name, score))
+        scored.sort(key=lambda m: (-m.score, m.name))
+        return (exact + scored)[:limit]
+
+    def resolve(self, query, kind=None, min_score=0.5) -> Optional[NameMatch]:
+        """The single best match for query, or None if nothing scores min_score."""
+        best = self.matches(query, kind=kind, limit=1, min_score=min_score)
+        return best[0] if best else None
+
+
+def best_match(query, names, min_score=0.5) -> Optional[NameMatch]:
+    """One-off resolve against a small collection of names (an inventory, a feature list)."""
+    return NameIndex(("name", name) for name in names).resolve(query, min_score=min_score)
+
+
+# ---- The shared index over every repository ----
+
+def _repositories():
+    from features import FEATURE_REGISTRY
+
+    sources = {
+        "spell": repositories.spells(),
+        "class": repositories.classes(),
+        "race": repositories.races(),
+        "background": repositories.backgrounds(),
+        "npc": repositories.npcs(),
+        "feature": FEATURE_REGISTRY,
+    }
+    if repositories.available("items"):
+        sources["item"] = repositories.items()
+    return sources
+
+
+def _names(source):
+    if isinstance(source, dict):
+        return source
+    if hasattr(source, "names"):
+        return source.names()
+    return source.by_name
+
+
+def build_name_index(sources=None):
+    sources = _repositories() if sources is None else sources
+    return NameIndex((kind, name) for kind, source in sources.items() for name in _names(source))
+
+
+_index = None
+_built_from = None      # repositories.generation() the index was built at
+_index_lock = threading.Lock()
+
+
+def name_index() -> NameIndex:
+    """The shared name index, built on first use and again after repositories.reload()."""
+    global _index, _built_from
+    generation = repositories.generation()
+    if _index is None or generation != _built_from:
+        with _index_lock:
+            if _index is None or generation != _built_from:
+                _index = build_name_index()
+                _built_from = generation
+    return _index
+
+
+def resolve(query, kind=None, min_score=0.5):
+    return name_index().resolve(query, kind=kind, min_score=min_score)
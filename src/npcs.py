@@ -1,12 +1,24 @@
-from character import AbilityScores, Inventory
+from character import AbilityScores, ArmorClassContext, Inventory
+from derived_stats import CachedArmorClass
 from resources import ResourcePool, Resource, ResourceCategory, RechargeType
 from actions import Action, ActionManager, ActionType
-from spellcasting import Spellcasting, SpellRepository
+from game_engine import DamageType
+from spellcasting import Spellcasting
 from dataclasses import dataclass, field
 from typing import List, Any
 from conditions import ConditionManager
 from features import FeatureManager
+from components import lazy_component, peek
+from stat_inputs import ABILITY_ABBREVIATIONS
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+import copy
+import json
+import mmap
 import re
+import threading
+import repositories
+from helper_functions import fg_normalizer
 
 
 # Class to create an NPC
@@ -64,61 +76,181 @@ import re
 
 #         return pc
 
-def unwrap(value):
-    if isinstance(value, dict):
-        if '#text' in value:
-            text = value['#text']
-            if value.get('@type') == 'number':
-                return int(text)
-            return text
-        # recursively unwrap nested dicts
-        return {k: unwrap(v) for k, v in value.items()}
-    elif isinstance(value, list):
-        return [unwrap(v) for v in value]
-    return value
-    
-def parse_attack(text: str):
-    attack_roll = {
-        "ability": None,
-        "bonus": 0,
-        "proficiency_type": None,
-        "precomputed": True
-    }
+NPC_FG = fg_normalizer("npc")
 
-    damage_roll = []
 
-    # #  Attack type
-    # attack_type_match = re.search(r"(Melee|Ranged) (Weapon|Spell) Attack:", text)
-    # if attack_type_match:
-    #     kind, category = attack_type_match.groups()
-    #     attack_roll["proficiency_type"] = f"{kind.lower()} {category.lower()}"
+def unwrap(value):
+    return NPC_FG.normalize(value)
+
+
+_ATTACK_KIND = re.compile(r"(Melee|Ranged|Melee or Ranged) (Weapon|Spell) Attack:", re.I)
+_TO_HIT = re.compile(r"([+-]\d+) to hit")
+_REACH = re.compile(r"reach (\d+) ft")
+_RANGE = re.compile(r"range (\d+)(?:/(\d+))? ft")
+_SAVE = re.compile(r"DC (\d+) (Strength|Dexterity|Constitution|Intelligence|Wisdom|Charisma) saving throw", re.I)
+_RECHARGE = re.compile(r"\(Recharge (\d)(?:\s*[-–]\s*6)?\)", re.I)
+_COST = re.compile(r"\(Costs (\d+) Actions\)", re.I)
+# "21 (2d10 + 10) piercing damage" or a flat "1 piercing damage"
+_DAMAGE = re.compile(r"(\d+)(?:\s*\((\d+)d(\d+)(?:\s*([+-])\s*(\d+))?\))?\s+(\w+) damage")
+_ALTERNATIVE = re.compile(r"\bor\b")
+
+
+@dataclass(frozen=True)
+class DamageClause:
+    dmg_type: DamageType
+    dice_type: int
+    dice_amount: int
+    bonus: int = 0
+
+    def as_roll(self):
+        """The damage_roll entry DiceHandler expects."""
+        return {"dmg_type": self.dmg_type,
+                "dice_type": self.dice_type,
+                "dice_amount": self.dice_amount,
+                "ability": None,
+                "bonus": self.bonus,
+                "precomputed": True}
+
+
+@dataclass(frozen=True)
+class ActionProfile:
+    """Combat-ready summary of one stat block action. Immutable, so every instance of a monster shares it."""
+    name: str
+    action_type: ActionType
+    attack_kind: str = None         # "melee weapon", "ranged spell", ...
+    to_hit: int = None
+    reach: int = None               # feet
+    range: tuple = None             # (normal, long) feet
+    damage: tuple = ()              # DamageClause, all dealt together
+    save_dc: int = None
+    save_ability: str = None        # "DEX"
+    save_half: bool = False
+    recharge: int = None            # lowest d6 roll that recharges it
+    cost: int = 1                   # legendary actions spent
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def is_attack(self):
+        return self.to_hit is not None
+
+    def attack_roll(self):
+        if self.to_hit is None:
+            return None
+        return {"ability": None, "bonus": self.to_hit, "proficiency_type": None, "precomputed": True}
+
+    def damage_roll(self):
+        return [clause.as_roll() for clause in self.damage]
+
+    def to_action(self):
+        return Action(id=self.name,
+                      name=self.name,
+                      action_type=self.action_type,
+                      attack_roll=self.attack_roll(),
+                      damage_roll=self.damage_roll(),
+                      profile=self)
+
+
+def parse_damage(text):
+    """
+    Damage clauses dealt together by the first effect in text, "+ 14 (4d6) fire damage" and "plus" extend it,
+    anything after an "or" is an alternative (two-handed use, a successful save) and is left out.
+    """
+    clauses = []
+    last_end = None
+    for match in _DAMAGE.finditer(text):
+        dmg_type = DamageType.__members__.get(match.group(6).upper())
+        if dmg_type is None:
+            continue
+        if last_end is not None and _ALTERNATIVE.search(text, last_end, match.start()):
+            break
+        average, amount, sides, sign, bonus = match.groups()[:5]
+        if amount is None:
+            # flat damage, rolled as that many d1
+            clauses.append(DamageClause(dmg_type, 1, int(average)))
+        else:
+            bonus = int(bonus or 0) * (-1 if sign == "-" else 1)
+            clauses.append(DamageClause(dmg_type, int(sides), int(amount), bonus))
+        last_end = match.end()
+    return tuple(clauses)
+
+
+def compile_action(name, text, action_type=ActionType.ACTION):
+    """Parse one stat block entry into an ActionProfile."""
+    text = str(text or "")
+    kind = _ATTACK_KIND.search(text)
+    to_hit = _TO_HIT.search(text)
+    reach = _REACH.search(text)
+    attack_range = _RANGE.search(text)
+    save = _SAVE.search(text)
+    recharge = _RECHARGE.search(name)
+    cost = _COST.search(name)
+
+    # an attack's damage follows "Hit:", a save's follows the save
+    if to_hit:
+        hit = text.find("Hit:")
+        damage = parse_damage(text[hit:] if hit >= 0 else text[to_hit.end():])
+    elif save:
+        damage = parse_damage(text[save.end():])
+    else:
+        damage = parse_damage(text)
+
+    return ActionProfile(
+        name=name,
+        action_type=action_type,
+        attack_kind=" ".join(g.lower() for g in kind.groups()) if kind else None,
+        to_hit=int(to_hit.group(1)) if to_hit else None,
+        reach=int(reach.group(1)) if reach else None,
+        range=(int(attack_range.group(1)), int(attack_range.group(2) or attack_range.group(1))) if attack_range else None,
+        damage=damage,
+        save_dc=int(save.group(1)) if save else None,
+        save_ability=ABILITY_ABBREVIATIONS[save.group(2).lower()] if save else None,
+        save_half=bool(save) and "half as much damage" in text,
+        recharge=int(recharge.group(1)) if recharge else None,
+        cost=int(cost.group(1)) if cost else 1,
+    )
 
-    # Hit bonus
-    hit_match = re.search(r"\+(\d+) to hit", text)
-    if hit_match:
-        attack_roll["bonus"] = int(hit_match.group(1))
 
-    #  Damage dice and type
-    dmg_match = re.search(
-        r"\((\d+)d(\d+)\)\s+(\w+)\s+damage",
-        text
+ACTION_SECTIONS = {
+    "actions": ActionType.ACTION,
+    "bonusactions": ActionType.BONUS,
+    "lairactions": ActionType.LAIR,
+    "legendaryactions": ActionType.LEGENDARY,
+    "reactions": ActionType.REACTION,
+}
+
+def compile_actions(npc_dict):
+    """Every action entry of an unwrapped stat block as ActionProfiles, compiled once per stat block."""
+    entries = tuple(
+        (section, entry.get("name"), str(entry.get("desc") or ""))
+        for section in ACTION_SECTIONS
+        for entry in (npc_dict.get(section) or {}).values()
     )
+    profiles = _compiled_actions.get(entries)
+    if profiles is None:
+        profiles = tuple(compile_action(name, desc, ACTION_SECTIONS[section]) for section, name, desc in entries)
+        _compiled_actions.put(entries, profiles)
+    return profiles
 
-    if dmg_match:
-        dice_amount = int(dmg_match.group(1))
-        dice_type = int(dmg_match.group(2))
-        dmg_type = dmg_match.group(3)
 
-        damage_roll.append({
-            "dmg_type": dmg_type,
-            "dice_type": dice_type,
-            "dice_amount": dice_amount,
-            "ability": None,
-            "bonus": 0,
-            "precomputed": True
-        })
+def spell_names(entry_name):
+    """'Bless - 1st level (3 slots)' -> ['Bless'], 'At will: light, thaumaturgy' -> ['light', 'thaumaturgy']"""
+    name = re.split(r"\s+-\s+", str(entry_name), maxsplit=1)[0]
+    if ":" in name:
+        name = name.split(":", 1)[1]
+    names = (re.sub(r"\s*\([^)]*\)\s*$", "", n).strip() for n in name.split(","))
+    return [n for n in names if n]
 
-    return attack_roll, damage_roll
+
+def parse_attack(text: str):
+    """attack_roll and damage_roll dicts for an action description."""
+    profile = compile_action("", text)
+    attack_roll = profile.attack_roll() or {"ability": None, "bonus": 0, "proficiency_type": None, "precomputed": True}
+    return attack_roll, profile.damage_roll()
 
 @dataclass
 class NPC:
@@ -141,15 +273,17 @@ class NPC:
     languages: str
     stats: "ComputedStats" = field(init=False)
 
+    # created on first use, most of a large population never reads them
+    spells = lazy_component(Spellcasting)
+    resources = lazy_component(ResourcePool)
+    inventory = lazy_component(Inventory)
+    conditions = lazy_component(ConditionManager)
+    features = lazy_component(FeatureManager)
+
     def __post_init__(self):
         self.stats = ComputedStats(self)
         self.actions = ActionManager(self)
-        self.spells = Spellcasting(self)
-        self.resources = ResourcePool(self)
         self.ability_scores = AbilityScores(self,scores=self.abilities)
-        self.inventory = Inventory(self)
-        self.conditions = ConditionManager(self)
-        self.features = FeatureManager(self)
 
 
 # Create NPC from json data, need a separate function to create a random npc
@@ -187,36 +321,15 @@ def create_npc(json_data):
     )
 
     # Create the actions
-    action_classes =['actions', 'bonusactions','lairactions','legendaryactions', 'reactions']
-    action_types =[ActionType.ACTION,ActionType.BONUS,ActionType.LAIR,ActionType.LEGENDARY, ActionType.REACTION]
-    
-    for val in range(len(action_classes)):
-        if npc_dict[action_classes[val]] is not None:
-            for key in  npc_dict[action_classes[val]]:
-
-                attack_roll, damage_roll = parse_attack(npc_dict[action_classes[val]][key]["desc"])
-                NPC_new.actions.add(
-                    Action( id= npc_dict[action_classes[val]][key]["name"],
-                            name= npc_dict[action_classes[val]][key]["name"],
-                            action_type= action_types[val],
-                            attack_roll=attack_roll,
-                            damage_roll=damage_roll)
-                    )
-                
-    # Create the spells
-    spell_repo = SpellRepository()
-    spell_classes =['innatespells', 'spells']
-    
-    for val in range(len(spell_classes)):
-        if npc_dict[spell_classes[val]] is not None:
-            for key in  npc_dict[spell_classes[val]]:
-                temp_spell = spell_repo.get(npc_dict[spell_classes[val]][key]["name"])
-                if temp_spell is not None:
-                    NPC_new.spells.add_spell(
-                        temp_spell
-                    )
-            
+    for profile in compile_actions(npc_dict):
+        NPC_new.actions.add(profile.to_action())
 
+    # Create the spells
+    spell_repo = repositories.spells()
+    for section in ('innatespells', 'spells'):
+        for entry in (npc_dict.get(section) or {}).values():
+            for spell in spell_repo.get_many(spell_names(entry.get("name", ""))):
+                NPC_new.spells.manage_spells(spell)
 
     # create resources from each spell slot if they exist
     if npc_dict.get("spellslots"):
@@ -231,29 +344,314 @@ def create_npc(json_data):
     return NPC_new
 
 
-class ComputedStats:
+# complete strings (skipped in one step, keys keep their colon) and braces
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"(?:\s*:)?|[{}]')
+
+
+def build_offset_index(buffer, fields=()):
+    """
+    Scan a JSON array of FG records once. Returns ({clean name: (start, end)}, {clean name: {field: value}})
+    with the byte span of every record and the unwrapped values of the requested top level fields.
+    Only strings and braces are visited, nothing is decoded except the wanted fields.
+    """
+    wanted = {f'"{f}"'.encode() for f in set(fields) | {"name"}}
+    index, values = {}, {}
+    depth = 0
+    record_start = None
+    field_spans = {}
+    pending_key = None      # wanted key whose value comes next
+    object_start = None     # start of an object valued wanted field
+
+    for match in _JSON_TOKEN.finditer(buffer):
+        token = match.group()
+
+        if token == b"{":
+            if depth == 0:
+                record_start = match.start()
+                field_spans = {}
+            elif depth == 1 and pending_key is not None:
+                object_start = match.start()
+            depth += 1
+        elif token == b"}":
+            depth -= 1
+            if depth == 1 and object_start is not None:
+                field_spans[pending_key] = (object_start, match.end())
+                pending_key = object_start = None
+            elif depth == 0 and b'"name"' in field_spans:
+                record = {
+                    key[1:-1].decode(): NPC_FG.loads(bytes(buffer[start:end]))
+                    for key, (start, end) in field_spans.items()
+                }
+                name = record.pop("name").replace(" (Copy)", "").strip()
+                index[name] = (record_start, match.end())
+                values[name] = record
+        elif depth == 1:
+            if token[-1:] == b":":
+                key = token[:-1].rstrip()
+                pending_key = key if key in wanted else None
+            elif pending_key is not None:
+                field_spans[pending_key] = match.span()
+                pending_key = None
+
+    return index, values
+
+
+def parse_cr(cr):
+    """'1/4' -> 0.25, '3' -> 3.0"""
+    if cr in (None, "", {}):
+        return None
+    cr = str(cr).strip()
+    if "/" in cr:
+        num, den = cr.split("/")
+        return int(num) / int(den)
+    return float(cr)
+
+
+def parse_speed(speed):
+    """'40 ft., climb 40 ft., fly 80 ft.' -> {'walk': 40, 'climb': 40, 'fly': 80}"""
+    speeds = {}
+    for part in str(speed or "").split(","):
+        match = re.match(r"\s*(?:([a-z]+)\s+)?(\d+)\s*ft", part.lower())
+        if match:
+            speeds[match.group(1) or "walk"] = int(match.group(2))
+    return speeds
+
+
+class _LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# compiled stat blocks keyed by their action texts, shared by every instance of a monster
+_compiled_actions = _LRUCache(maxsize=4096)
+
+
+def base_type(creature_type):
+    """'humanoid (any race)' -> 'humanoid'"""
+    return str(creature_type or "").split("(")[0].strip().lower()
+
+
+class NPCRepository:
+    """
+    Lazy bestiary over an FG npc.json export. The file is scanned once for the byte
+    span of every stat block; blocks are read from a memory map and built into NPCs
+    only when asked for, with the most recently used NPC templates kept in an LRU.
+    The map is opened on first read and released by close() (or a with block), copies
+    and pickles never share it.
+    """
+
+    INDEXED_FIELDS = ("cr", "xp", "type", "size", "alignment", "speed")
+
+    def __init__(self, path="../data/npc.json", cache_size=128):
+        self.path = path
+        self.cache_size = cache_size
+        self._mmap = None
+        self._templates = _LRUCache(cache_size)
+
+        # Primary index (name -> byte span in the file), plus the fields the
+        # secondary indexes are built from
+        self.spans, self.summaries = build_offset_index(self._buffer(), fields=self.INDEXED_FIELDS)
+        for summary in self.summaries.values():
+            summary["cr"] = parse_cr(summary.get("cr"))
+            summary["xp"] = int(summary["xp"]) if str(summary.get("xp", "")).isdigit() else None
+            summary["speed"] = parse_speed(summary.get("speed"))
+
+        # Secondary indexes: sorted (value, name) pairs for range queries ...
+        self.by_cr = sorted((s["cr"], name) for name, s in self.summaries.items() if s["cr"] is not None)
+        self.by_xp = sorted((s["xp"], name) for name, s in self.summaries.items() if s["xp"] is not None)
+        self._cr_keys = [cr for cr, _ in self.by_cr]
+        self._xp_keys = [xp for xp, _ in self.by_xp]
+
+        # ... and buckets for exact matches
+        self.by_type = defaultdict(list)
+        self.by_size = defaultdict(list)
+        self.by_alignment = defaultdict(list)
+        self.by_movement = defaultdict(list)
+        for name, summary in self.summaries.items():
+            self.by_type[base_type(summary.get("type"))].append(name)
+            self.by_size[str(summary.get("size", "")).lower()].append(name)
+            self.by_alignment[str(summary.get("alignment", "")).lower()].append(name)
+            for mode, feet in summary["speed"].items():
+                if feet > 0:
+                    self.by_movement[mode].append(name)
+
+        # the scan is done, reads reopen the map when needed
+        self.close()
+
+    def __getstate__(self):
+        # the memory map and cached NPCs are per process
+        state = dict(self.__dict__)
+        state["_mmap"] = None
+        state["_templates"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._templates = _LRUCache(self.cache_size)
+
+    def _buffer(self):
+        if self._mmap is None:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self):
+        """Release the memory map, the next read opens it again."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def names(self):
+        return list(self.spans)
+
+    # ---- Secondary index queries ----
+
+    @staticmethod
+    def _range(keys, pairs, low, high):
+        start = 0 if low is None else bisect_left(keys, low)
+        end = len(keys) if high is None else bisect_right(keys, high)
+        return [name for _, name in pairs[start:end]]
+
+    def filter_by_cr(self, min_cr=None, max_cr=None):
+        """Names with min_cr <= CR <= max_cr, CRs as numbers or strings like '1/2'."""
+        return self._range(self._cr_keys, self.by_cr, parse_cr(min_cr), parse_cr(max_cr))
+
+    def filter_by_xp(self, min_xp=None, max_xp=None):
+        return self._range(self._xp_keys, self.by_xp, min_xp, max_xp)
+
+    # buckets are copied out so the result is a list whether or not the indexes are frozen
+
+    def filter_by_type(self, creature_type):
+        return list(self.by_type.get(base_type(creature_type), ()))
+
+    def filter_by_size(self, size):
+        return list(self.by_size.get(size.lower(), ()))
+
+    def filter_by_alignment(self, alignment):
+        return list(self.by_alignment.get(alignment.lower(), ()))
+
+    def filter_by_movement(self, mode):
+        """Names with a non zero speed for mode (walk, fly, swim, climb, burrow)."""
+        return list(self.by_movement.get(mode.lower(), ()))
+
+    def query(self, min_cr=None, max_cr=None, creature_type=None, size=None,
+              alignment=None, movement=None, min_xp=None, max_xp=None):
+        """Names matching every given filter, e.g. query(min_cr="1/2", max_cr=2, creature_type="undead")."""
+        candidates = []
+        if creature_type is not None:
+            candidates.append(self.filter_by_type(creature_type))
+        if size is not None:
+            candidates.append(self.filter_by_size(size))
+        if alignment is not None:
+            candidates.append(self.filter_by_alignment(alignment))
+        if movement is not None:
+            candidates.append(self.filter_by_movement(movement))
+        if min_cr is not None or max_cr is not None:
+            candidates.append(self.filter_by_cr(min_cr, max_cr))
+        if min_xp is not None or max_xp is not None:
+            candidates.append(self.filter_by_xp(min_xp, max_xp))
+        if not candidates:
+            return self.names()
+
+        # start from the smallest candidate list
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            other = set(other)
+            result = [name for name in result if name in other]
+        return result
+
+    def __contains__(self, name):
+        return name in self.spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def raw(self, name):
+        """The original FG json record of a stat block, or None."""
+        span = self.spans.get(name)
+        if span is None:
+            return None
+        return json.loads(self._buffer()[span[0]:span[1]])
+
+    def record(self, name):
+        """The unwrapped stat block as a plain dict, or None."""
+        span = self.spans.get(name)
+        if span is None:
+            return None
+        return NPC_FG.loads(self._buffer()[span[0]:span[1]])
+
+    def get(self, name):
+        """
+        Shared NPC template for name (built on first use), or None.
+        Treat it as read-only, use create() for an NPC that takes part in play.
+        """
+        template = self._templates.get(name)
+        if template is None:
+            raw = self.raw(name)
+            if raw is None:
+                return None
+            template = create_npc(raw)
+            self._templates.put(name, template)
+        return template
+
+    def create(self, name):
+        """A new independent NPC copied from the cached template."""
+        template = self.get(name)
+        if template is None:
+            raise ValueError(f"{name} not a valid NPC.")
+        return copy.deepcopy(template)
+
+
+class ComputedStats(CachedArmorClass):
+    __slots__ = ("pc",)
+
     def __init__(self, pc):
+        super().__init__()
         self.pc = pc
-    #     self._ac_cache = self.armor_class()
 
-    def armor_class(self):
-        return self.pc.ac
+    def _compute_armor_class(self):
+        # the stat block AC already includes DEX and worn armor
         ctx = ArmorClassContext(self.pc)
-
-        # # Armor & shields
-        # self.pc.inventory.modify_armor_class(ctx)
-
-        # # Class & racial features
-        # self.pc.features.modify_armor_class(ctx)
-
-        # # Conditions (haste, restrained, etc.)
-        # self.pc.conditions.modify_armor_class(ctx)
-
-        # dex_mod = self.pc.ability_scores.modifier("dex")
-        if ctx.dex_cap is not None:
-            dex_mod = min(dex_mod, ctx.dex_cap)
-
-        return ctx.base + dex_mod + ctx.bonus
+        if isinstance(self.pc.ac, int):
+            ctx.set_base(self.pc.ac)
+
+        # components that were never created cannot change it
+        inventory = peek(self.pc, "inventory")
+        if inventory is not None:
+            inventory.modify_armor_class(ctx)
+        conditions = peek(self.pc, "conditions")
+        if conditions is not None:
+            conditions.apply_armor_class_effects(ctx)
+
+        ac = ctx.base + ctx.bonus
+        features = peek(self.pc, "features")
+        return ac if features is None else features.modify_ac(self.pc, ac)
     
     # def initiative(self):
     #     # Baseline based on ability, modified by any features, items, spells, etc.
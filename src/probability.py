@@ -0,0 +1,204 @@
+# Exact probability distributions for dice expressions and attacks.
+# Lets the GM answer "what are the odds" questions without Monte Carlo over
+# DiceHandler.roll_attack. Distributions are cached, so repeated queries are cheap.
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from proficiency import ProficiencyType
+
+
+@dataclass(frozen=True)
+class PMF:
+    """Probability mass function over the integers offset .. offset + len(probs) - 1."""
+    offset: int
+    probs: np.ndarray
+
+    @property
+    def min(self) -> int:
+        return self.offset
+
+    @property
+    def max(self) -> int:
+        return self.offset + len(self.probs) - 1
+
+    @property
+    def values(self) -> np.ndarray:
+        return np.arange(self.offset, self.offset + len(self.probs))
+
+    def mean(self) -> float:
+        return float(self.values @ self.probs)
+
+    def prob(self, value) -> float:
+        i = value - self.offset
+        if 0 <= i < len(self.probs):
+            return float(self.probs[i])
+        return 0.0
+
+    def prob_at_least(self, value) -> float:
+        i = max(value - self.offset, 0)
+        return float(self.probs[i:].sum())
+
+    def percentile(self, q) -> int:
+        """Smallest value v with P(X <= v) >= q, q in [0, 1]."""
+        cdf = np.cumsum(self.probs)
+        i = int(np.searchsorted(cdf, q - 1e-12))
+        return self.offset + min(i, len(self.probs) - 1)
+
+    def shift(self, k) -> "PMF":
+        return PMF(self.offset + k, self.probs)
+
+    def __add__(self, other) -> "PMF":
+        """Distribution of the sum of two independent variables (or a PMF plus a flat int)."""
+        if isinstance(other, int):
+            return self.shift(other)
+        return PMF(self.offset + other.offset, np.convolve(self.probs, other.probs))
+
+    __radd__ = __add__
+
+
+def _constant(value=0) -> PMF:
+    return PMF(value, np.ones(1))
+
+
+@lru_cache(maxsize=1024)
+def dice_pmf(sides, count=1) -> PMF:
+    """Exact PMF of `count`d`sides`, built by repeated squaring of the single die PMF."""
+    if count == 0:
+        return _constant(0)
+    if count == 1:
+        return PMF(1, np.full(sides, 1.0 / sides))
+    half = dice_pmf(sides, count // 2)
+    result = half + half
+    if count % 2:
+        result = result + dice_pmf(sides, 1)
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _specs_pmf(dice_specs: Tuple[Tuple[int, int], ...]) -> PMF:
+    result = _constant(0)
+    for sides, count in dice_specs:
+        result = result + dice_pmf(sides, count)
+    return result
+
+
+def roll_pmf(dice_specs, modifiers=0) -> PMF:
+    """PMF of DiceHandler.roll(dice_specs, modifiers) without features."""
+    return _specs_pmf(tuple(tuple(spec) for spec in dice_specs)).shift(modifiers)
+
+
+@lru_cache(maxsize=None)
+def d20_pmf(advantage=None, reroll_ones=False) -> PMF:
+    """
+    PMF of the natural d20 under Dice.roll's advantage rules.
+    reroll_ones models features.HalflingLuck (each 1 is rerolled as 2-20 before adv/dis).
+    """
+    single = np.full(20, 1.0 / 20)
+    if reroll_ones:
+        single = np.concatenate(([0.0], np.full(19, 1.0 / 20 + 1.0 / 20 / 19)))
+    cdf = np.cumsum(single)
+    if advantage is None:
+        return PMF(1, single)
+    elif advantage == "adv":
+        cdf = cdf ** 2
+    elif advantage == "dis":
+        cdf = 1 - (1 - cdf) ** 2
+    else:
+        raise ValueError("advantage must be one of adv or dis")
+    return PMF(1, np.diff(cdf, prepend=0.0))
+
+
+def hit_probability(bonus, ac, advantage=None, natural_rules=False, reroll_ones=False):
+    """
+    Returns (P(hit), P(crit)) for a d20 + bonus attack against ac.
+    By default this matches DiceHandler.roll_attack (hit on total >= ac). With
+    natural_rules a natural 20 always hits and a natural 1 always misses.
+    """
+    d20 = d20_pmf(advantage, reroll_ones)
+    p_crit = float(d20.probs[19])
+    # need a natural roll of at least ac - bonus
+    needed = min(max(ac - bonus, 1), 21)
+    p_hit = float(d20.probs[needed - 1:].sum())
+    if natural_rules:
+        p_hit = min(max(p_hit, p_crit), 1 - float(d20.probs[0]))
+    # summing the pmf can land a rounding error outside [0, 1], e.g. 1.0000000000000002
+    return min(max(p_hit, 0.0), 1.0), min(max(p_crit, 0.0), 1.0)
+
+
+# ---- Actions ----
+
+def attack_bonus(action, source=None) -> int:
+    """The flat attack modifier DiceHandler.roll_attack would add for this action/source."""
+    if action.attack_roll.get("precomputed"):
+        return action.attack_roll["bonus"]
+    if source.proficiencies.has_proficiency(ProficiencyType.WEAPON, action.proficiency_type):
+        prof = source.proficiencies.proficiency_bonus
+    else:
+        prof = 0
+    return source.ability_scores.modifier(action.attack_roll["ability"]) + action.attack_roll["bonus"] + prof
+
+
+def damage_bonus(damage_entry, source=None) -> int:
+    """The flat bonus DiceHandler.roll_attack adds to one damage_roll entry of an action."""
+    if damage_entry.get("precomputed"):
+        return damage_entry["bonus"]
+    return damage_entry["bonus"] + source.ability_scores.modifier(damage_entry["ability"])
+
+
+def _damage_key(action, source=None):
+    return tuple((val["dice_type"], val["dice_amount"], damage_bonus(val, source))
+                 for val in action.damage_roll or [])
+
+
+@lru_cache(maxsize=1024)
+def _damage_pmf(damage_key, crit=False) -> PMF:
+    result = _constant(0)
+    for sides, count, bonus in damage_key:
+        result = result + dice_pmf(sides, count * 2 if crit else count) + bonus
+    return result
+
+
+def damage_pmf(action, source=None, crit=False) -> PMF:
+    """PMF of the total damage of an action on a hit (all damage types summed)."""
+    return _damage_pmf(_damage_key(action, source), crit)
+
+
+@dataclass
+class AttackOdds:
+    hit_chance: float
+    crit_chance: float
+    expected_damage: float
+    damage_on_hit: PMF
+
+    def damage_percentile(self, q) -> int:
+        return self.damage_on_hit.percentile(q)
+
+
+def rerolls_ones(source):
+    """True if one of source's roll features rerolls natural 1s (features.HalflingLuck)."""
+    return source is not None and any(getattr(f, "reroll_ones", False) for f in source.features.roll_features)
+
+
+def attack_odds(action, target_ac, source=None, advantage=None, natural_rules=False) -> AttackOdds:
+    """
+    Exact odds for action (an actions.Action) against target_ac.
+    source is needed when the action's rolls are not precomputed, and for its roll features.
+    With natural_rules, natural 20s also double the damage dice.
+    """
+    bonus = attack_bonus(action, source)
+    p_hit, p_crit = hit_probability(bonus, target_ac, advantage, natural_rules, reroll_ones=rerolls_ones(source))
+    on_hit = damage_pmf(action, source)
+
+    if natural_rules:
+        on_crit = damage_pmf(action, source, crit=True)
+        expected = (p_hit - p_crit) * on_hit.mean() + p_crit * on_crit.mean()
+    else:
+        expected = p_hit * on_hit.mean()
+
+    return AttackOdds(hit_chance=p_hit,
+                      crit_chance=p_crit,
+                      expected_damage=expected,
+                      damage_on_hit=on_hit)
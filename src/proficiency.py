@@ -1,4 +1,5 @@
 from enum import Enum, auto
+import stat_inputs
 def proficiency_bonus(level: int) -> int:
     return 2 + ((level - 1) // 4)
 
@@ -15,6 +16,8 @@ class ProficiencyType(Enum):
 
 # Manager class to deal with proficiency
 class ProficiencyManager:
+    __slots__ = ("owner", "proficiencies", "proficiency_bonus")
+
     def __init__(self, owner):
         self.owner = owner
         self.proficiencies = {
@@ -30,11 +33,13 @@ class ProficiencyManager:
     
     def update_proficiency_bonus(self, level: int) -> int:
         self.proficiency_bonus = 2 + (level - 1) // 4
+        stat_inputs.invalidate(self.owner, stat_inputs.PROFICIENCY_BONUS)
         return self.proficiency_bonus
     
     def add_proficiencies(self, source_proficiencies):
         for prof_type, values in source_proficiencies.items():
             self.proficiencies[prof_type].update(values)
+            stat_inputs.invalidate(self.owner, stat_inputs.proficiency_input(prof_type))
 
     def has_proficiency(self, prof_type, value):
         return value in self.proficiencies[prof_type]
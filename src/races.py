@@ -1,14 +1,58 @@
-import pandas as pd
+import csv
 from proficiency import ProficiencyType
+import repositories
 import ast
+
+# Numeric columns of woc_races_clean.csv, everything else stays a string
+RACE_INT_COLUMNS = ("STR", "INT", "DEX", "CHA", "WIS", "CON", "walking_speed", "darkvision")
+
+
+def read_csv_records(path, int_columns=()):
+    """Rows of a csv file as dicts, with int_columns converted to int."""
+    with open(path, newline="", encoding="utf-8") as f:
+        records = list(csv.DictReader(f))
+    for row in records:
+        for column in int_columns:
+            row[column] = int(row[column])
+    return records
+
+
+class CSVRepository:
+    """Rows of a csv file indexed by their "name" column. Subclasses set the int columns."""
+    INT_COLUMNS = ()
+
+    def __init__(self, path):
+        self.path = path
+
+        # Primary index (fast lookup by name)
+        self.by_name = {row["name"]: row for row in read_csv_records(path, self.INT_COLUMNS)}
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def names(self):
+        return list(self.by_name)
+
+    def to_dataframe(self):
+        # analytics only, pandas is not needed to build characters
+        import pandas as pd
+        return pd.DataFrame([dict(row) for row in self.by_name.values()])
+
+
+class RaceRepository(CSVRepository):
+    INT_COLUMNS = RACE_INT_COLUMNS
+
+    def __init__(self, path="../data/woc_races_clean.csv"):
+        super().__init__(path)
+
+
 # Look up values from db
 class Race:
     def __init__(self, id):
-        df = pd.read_csv("../data/woc_races_clean.csv")
         self.id = id
-        if id not in df["name"].values:
+        self.racial_data = repositories.races().get(id)
+        if self.racial_data is None:
             raise ValueError(f"{id} not a valid race.")
-        self.racial_data=df[df["name"]==id].iloc[0].to_dict()
 
 
     def apply(self, character):
@@ -0,0 +1,184 @@
+# Process-wide registry of the rules repositories (classes, spells, races, ...).
+# Each dataset is loaded at most once per process, on first use, and handed out
+# with read-only indexes so it can be shared between threads and sessions.
+import copy
+import os
+import threading
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+
+def data_path(filename):
+    return os.path.join(DATA_DIR, filename)
+
+
+def _load_classes():
+    from classes import CharClassRepository
+    return CharClassRepository(data_path("class.json"))
+
+
+def _load_spells():
+    from spellcasting import SpellRepository
+    return SpellRepository(data_path("spell.json"), data_path("woc_spells.csv"))
+
+
+def _load_items():
+    from items import ItemRepository
+    return ItemRepository(data_path("item.json"))
+
+
+def _load_races():
+    from races import RaceRepository
+    return RaceRepository(data_path("woc_races_clean.csv"))
+
+
+def _load_backgrounds():
+    from character import BackgroundRepository
+    return BackgroundRepository(data_path("woc_backgrounds.csv"))
+
+
+def _load_npcs():
+    from npcs import NPCRepository
+    return NPCRepository(data_path("npc.json"))
+
+
+LOADERS = {
+    "classes": _load_classes,
+    "spells": _load_spells,
+    "items": _load_items,
+    "races": _load_races,
+    "backgrounds": _load_backgrounds,
+    "npcs": _load_npcs,
+}
+
+# Source files of each dataset, used to invalidate the precompiled snapshot
+SOURCES = {
+    "classes": ["class.json"],
+    "spells": ["spell.json", "woc_spells.csv"],
+    "items": ["item.json"],
+    "races": ["woc_races_clean.csv"],
+    "backgrounds": ["woc_backgrounds.csv"],
+    "npcs": ["npc.json"],
+}
+
+# Load from / save to the precompiled snapshot (see snapshot.py)
+USE_SNAPSHOT = True
+
+_repositories = {}
+_lock = threading.Lock()
+_generation = 0     # bumped by reload(), lets caches built from the repositories notice
+
+
+class FrozenDict(dict):
+    """Read-only dict for repository indexes (unlike MappingProxyType it can be pickled)."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("repository indexes are read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def freeze(repository):
+    """
+    Copy of the repository with its dict/list indexes swapped for read-only views.
+    Only the indexes are frozen, the objects in them (CharClass, Spell, ...) are shared by every
+    caller and must not be modified, copy one first (as NPCRepository.create does).
+    """
+    frozen = copy.copy(repository)
+    for attr, value in vars(repository).items():
+        if isinstance(value, (dict, list)):
+            setattr(frozen, attr, _freeze(value))
+    return frozen
+
+
+def available(name):
+    """True if every source file of the dataset is in the data directory."""
+    return all(os.path.exists(data_path(f)) for f in SOURCES.get(name, ()))
+
+
+def _load(name):
+    if not USE_SNAPSHOT:
+        return LOADERS[name]()
+
+    import snapshot
+    repository = snapshot.load_repository(name)
+    if repository is None:
+        repository = LOADERS[name]()
+        snapshot.store_repository(name, repository)
+    return repository
+
+
+def get(name):
+    """The shared repository called `name`, loading it if this is the first request."""
+    repository = _repositories.get(name)
+    if repository is None:
+        with _lock:
+            repository = _repositories.get(name)
+            if repository is None:
+                if name not in LOADERS:
+                    raise ValueError(f"Unknown repository {name!r}, must be one of {sorted(LOADERS)}")
+                if not available(name):
+                    missing = [f for f in SOURCES[name] if not os.path.exists(data_path(f))]
+                    raise FileNotFoundError(f"The {name} repository needs {', '.join(missing)} in {DATA_DIR}")
+                repository = freeze(_load(name))
+                _repositories[name] = repository
+    return repository
+
+
+def reload(name=None):
+    """Drop one (or every) loaded repository so the next get() reads the data again."""
+    global _generation
+    with _lock:
+        _generation += 1
+        if name is None:
+            _repositories.clear()
+        else:
+            _repositories.pop(name, None)
+        if USE_SNAPSHOT:
+            import snapshot
+            snapshot.clear()
+
+
+def generation():
+    """Number of reload() calls so far."""
+    return _generation
+
+
+def loaded():
+    return sorted(_repositories)
+
+
+def classes():
+    return get("classes")
+
+
+def spells():
+    return get("spells")
+
+
+def items():
+    return get("items")
+
+
+def races():
+    return get("races")
+
+
+def backgrounds():
+    return get("backgrounds")
+
+
+def npcs():
+    return get("npcs")
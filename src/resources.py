@@ -19,7 +19,7 @@ class RechargeType(Enum):
     NONE = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class Resource:
     id: str                     # unique key (e.g. "ki_points")
     name: str                   # display name
@@ -39,7 +39,24 @@ class Resource:
         return value
 
 
+SPELL_LEVELS = ("cantrips",) + tuple("Level_" + str(a + 1) for a in range(9))
+
+
+def _spell_table(suffix, name, category, recharge):
+    return {a: Resource(id=a + suffix,
+                        name=a + name,
+                        category=category,
+                        current=0,
+                        maximum=0,
+                        recharge=recharge,
+                        source="class")
+            for a in SPELL_LEVELS}
+
+
 class ResourcePool:
+    __slots__ = ("owner", "max_hit_points", "current_hit_points", "hit_die", "death_saves",
+                 "_spells", "_spell_slots", "resources")
+
     def __init__(self, owner):
         self.owner = owner
         self.max_hit_points = 0
@@ -47,30 +64,28 @@ class ResourcePool:
         self.hit_die: Dict[int, int] = {}
         self.death_saves = {"success": 0, "failure": 0}
 
-        spell_types = ["cantrips"]+["Level_"+str(a+1) for a in range(9)]
-
-        # Create a holder for the amount of spells a character can know
-        self.spells ={a:Resource(id=a+"_spells",
-                                 name=a+" Spells",
-                                   category=ResourceCategory.CLASS_RESOURCE,
-                                     current=0,
-                                     maximum=0,
-                                     recharge=RechargeType.NONE,
-                                     source="class"
-                                     )  for a in spell_types}
-        
-        # Create a holder for the amount of spell slots a character has access to
-        self.spell_slots ={a:Resource(id=a+"_spell_slots",
-                                 name=a+" Spell Slots",
-                                   category=ResourceCategory.SPELL_SLOT,
-                                     current=0,
-                                     maximum=0,
-                                     recharge=RechargeType.LONG_REST, # for Warlock switch to short rest
-                                     source="class"
-                                     )  for a in spell_types}
+        # the per level spell tables are built on first use, most NPCs never read them
+        self._spells = None
+        self._spell_slots = None
         # 🔥 unified system
         self.resources: Dict[str, Resource] = {}
 
+    # Holder for the amount of spells a character can know
+    @property
+    def spells(self):
+        if self._spells is None:
+            self._spells = _spell_table("_spells", " Spells", ResourceCategory.CLASS_RESOURCE, RechargeType.NONE)
+        return self._spells
+
+    # Holder for the amount of spell slots a character has access to
+    @property
+    def spell_slots(self):
+        if self._spell_slots is None:
+            # for Warlock switch to short rest
+            self._spell_slots = _spell_table("_spell_slots", " Spell Slots", ResourceCategory.SPELL_SLOT,
+                                             RechargeType.LONG_REST)
+        return self._spell_slots
+
     def get(self, resource_name):
         return next((obj for obj in self.resources if obj.name == resource_name), None)
     
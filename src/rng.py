@@ -0,0 +1,72 @@
+# Random number streams for everything that rolls dice.
+# Each session (or simulation worker) gets its own seeded RNGStream so results
+# are reproducible and concurrent sessions never share random state.
+import random as random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+
+class RNGStream:
+    """
+    A seedable random stream with a scalar (random.Random) and a vectorized
+    (numpy Generator) side, both derived from the same seed.
+    Use spawn() to get independent child streams, e.g. one per worker process.
+    """
+
+    def __init__(self, seed=None):
+        if isinstance(seed, np.random.SeedSequence):
+            self.seed_sequence = seed
+        else:
+            self.seed_sequence = np.random.SeedSequence(seed)
+        self.seed = self.seed_sequence.entropy
+        self.generator = np.random.default_rng(self.seed_sequence)
+        self._random = random.Random(int(self.seed_sequence.generate_state(2, dtype=np.uint64)[0]))
+
+        # bound methods so the scalar dice path is a single call
+        self.randint = self._random.randint
+        self.random = self._random.random
+
+    def __repr__(self):
+        return f"RNGStream(seed={self.seed}, spawn_key={self.seed_sequence.spawn_key})"
+
+    def spawn(self, n=1):
+        """Return n independent child streams."""
+        return [RNGStream(child) for child in self.seed_sequence.spawn(n)]
+
+    def integers(self, low, high, size=None):
+        """Numpy style integers in [low, high]."""
+        return self.generator.integers(low, high + 1, size=size, dtype=np.int32)
+
+    def block(self, sides, size):
+        """A bulk block of die results (1..sides), e.g. block(20, 10_000) for d20s."""
+        return self.generator.integers(1, sides + 1, size=size, dtype=np.int32)
+
+
+_default_stream = RNGStream()
+# set only inside use_stream(), everywhere else rolls use the (re)seedable default stream
+_current_stream: ContextVar[RNGStream] = ContextVar("rng_stream", default=None)
+
+
+def current():
+    """The stream rolls should draw from in the current session/thread."""
+    stream = _current_stream.get()
+    return _default_stream if stream is None else stream
+
+
+def seed(value=None):
+    """Reseed the process-wide default stream, seen by every thread and context not inside use_stream()."""
+    global _default_stream
+    _default_stream = RNGStream(value)
+    return _default_stream
+
+
+@contextmanager
+def use_stream(stream):
+    """Route every roll inside the block through `stream`."""
+    token = _current_stream.set(stream)
+    try:
+        yield stream
+    finally:
+        _current_stream.reset(token)
@@ -0,0 +1,114 @@
+# Roll history for the engine. Dice/DiceHandler emit every RollResult to the
+# active sink, once per roll: DiceHandler sends "roll", "attack" and "damage" events and
+# the dice it rolls for them are not sent again as "dice" events. By default nothing is
+# recorded so the hot path only pays for a single attribute check.
+import json
+import time
+from collections import deque
+
+
+def roll_to_dict(event_type, roll_result):
+    return {
+        "time": time.time(),
+        "event": event_type,
+        "dice": list(roll_result.dice),
+        "base_total": roll_result.base_total,
+        "modifiers": roll_result.modifiers,
+        "total": roll_result.total,
+        "advantage": roll_result.advantage,
+        "is_critical": roll_result.is_critical,
+        "metadata": roll_result.metadata if roll_result.has_metadata else {},
+    }
+
+
+class RollSink:
+    """Base sink, disabled. The engine skips emit() entirely when enabled is False."""
+    enabled = False
+
+    def emit(self, event_type, roll_result):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class NullRollSink(RollSink):
+    pass
+
+
+class RingBufferRollSink(RollSink):
+    """
+    Keeps the last `maxlen` roll events in memory (e.g. for the web app or the GM).
+    Events are stored as dicts since RollResults get modified after they are emitted.
+    """
+    enabled = True
+
+    def __init__(self, maxlen=1000):
+        self.events = deque(maxlen=maxlen)
+
+    def emit(self, event_type, roll_result):
+        self.events.append(roll_to_dict(event_type, roll_result))
+
+    def recent(self, n=None):
+        if n is None:
+            return list(self.events)
+        return list(self.events)[-n:]
+
+    def clear(self):
+        self.events.clear()
+
+
+class JSONLRollSink(RollSink):
+    """Appends roll events to a JSON lines file, writing in batches of `batch_size`."""
+    enabled = True
+
+    def __init__(self, path, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer = []
+
+    def emit(self, event_type, roll_result):
+        self._buffer.append(roll_to_dict(event_type, roll_result))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(e, default=str) for e in self._buffer))
+            f.write("\n")
+        self._buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ConsoleRollSink(RollSink):
+    """Prints each roll, same as the old debug output. Useful in notebooks only."""
+    enabled = True
+
+    def emit(self, event_type, roll_result):
+        print(f"[{event_type}] rolls: {roll_result.dice} -> total: {roll_result.total}")
+
+
+# Active sink, swap with set_sink()
+sink = NullRollSink()
+
+
+def set_sink(new_sink):
+    global sink
+    previous = sink
+    previous.flush()
+    sink = new_sink if new_sink is not None else NullRollSink()
+    return previous
+
+
+def get_sink():
+    return sink
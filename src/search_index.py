@@ -0,0 +1,229 @@
+# Full text search over the rules data (spells, classes, races, backgrounds, NPCs, items)
+# backed by an SQLite FTS5 index in a local file. The index is rebuilt automatically
+# when any of its source files change.
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import repositories
+import snapshot
+from npcs import parse_cr
+
+INDEX_PATH = repositories.data_path("rules_search.db")
+# rows come from the parsed repositories, so a parsing change (new snapshot version) rebuilds it too
+INDEX_VERSION = f"2.{snapshot.SNAPSHOT_VERSION}"
+
+# Files the index is built from; missing files are skipped
+INDEX_SOURCES = ["spell.json", "woc_spells.csv", "class.json", "woc_races_clean.csv",
+                 "woc_backgrounds.csv", "npc.json", "item.json"]
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE entries USING fts5(name, body, tokenize = 'porter unicode61');
+CREATE TABLE meta (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    level INTEGER,
+    school TEXT,
+    source TEXT,
+    creature_type TEXT,
+    cr REAL
+);
+CREATE INDEX meta_kind ON meta(kind);
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+@dataclass
+class SearchHit:
+    kind: str          # spell, class, class_feature, race, background, npc, item
+    name: str
+    score: float       # bm25 rank, lower is better
+    level: Optional[int] = None
+    school: Optional[str] = None
+    source: Optional[str] = None
+    creature_type: Optional[str] = None
+    cr: Optional[float] = None
+
+
+def _clean_name(name):
+    return name.replace(" (Copy)", "").strip()
+
+
+# ---- Corpora, each yields (kind, name, body, level, school, source, creature_type, cr) ----
+
+def _spell_rows():
+    # spell.json and woc_spells.csv, already merged by the repository
+    for spell in repositories.spells().all_spells:
+        yield ("spell", spell.name, spell.description, spell.level, spell.school, spell.source, None, None)
+
+
+def _class_rows():
+    for char_class in repositories.classes().all_charclasses:
+        body = " ".join(name for level in char_class.class_features.values() for name in level)
+        yield ("class", char_class.name, body, None, None, None, None, None)
+        for level, level_features in char_class.class_features.items():
+            for feature_name, description in level_features.items():
+                yield ("class_feature", feature_name, description, level, None, char_class.name, None, None)
+
+
+def _race_rows():
+    for name, row in repositories.races().by_name.items():
+        yield ("race", name, row["description"], None, None, None, row.get("creature_type"), None)
+
+
+def _background_rows():
+    for name, row in repositories.backgrounds().by_name.items():
+        yield ("background", name, row["description"], None, None, None, None, None)
+
+
+def _npc_rows():
+    from helper_functions import extract_text
+    from helper_functions import load_fg
+
+    path = repositories.data_path("npc.json")
+    if not os.path.exists(path):
+        return
+    for npc in load_fg(path, "npc"):
+        parts = [npc.get("type"), npc.get("size"), npc.get("alignment"), npc.get("senses"), npc.get("languages")]
+        for section in ("traits", "actions", "bonusactions", "reactions", "legendaryactions", "lairactions"):
+            for entry in (npc.get(section) or {}).values():
+                parts.append(f"{entry.get('name', '')}. {extract_text(entry.get('desc', ''))}")
+        parts.append(extract_text(npc.get("text", "")))
+        yield ("npc", _clean_name(npc["name"]), " ".join(str(p) for p in parts if p),
+               None, None, None, npc.get("type"), parse_cr(npc.get("cr")))
+
+
+def _item_rows():
+    if not os.path.exists(repositories.data_path("item.json")):
+        return
+    for item in repositories.items().all_items:
+        yield ("item", item.name, item.description, None, None, item.type, None, None)
+
+
+CORPORA = [_spell_rows, _class_rows, _race_rows, _background_rows, _npc_rows, _item_rows]
+
+
+def _query_string(text):
+    # free text -> AND of prefix terms, so punctuation can't break the FTS syntax
+    terms = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+class RulesSearchIndex:
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._build_lock = threading.Lock()
+        self.ensure_current()
+
+    def _sources(self):
+        return [f for f in INDEX_SOURCES if os.path.exists(repositories.data_path(f))]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def _stored_signature(self):
+        try:
+            conn = sqlite3.connect(self.path)
+            try:
+                rows = dict(conn.execute("SELECT key, value FROM info").fetchall())
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            return None
+        if rows.get("version") != INDEX_VERSION:
+            return None
+        return [tuple(s) for s in json.loads(rows["sources"])]
+
+    def ensure_current(self):
+        """Rebuild the index file if it is missing or any source file changed."""
+        with self._build_lock:
+            signature = self._stored_signature() if os.path.exists(self.path) else None
+            if (signature is None
+                    or [s[0] for s in signature] != self._sources()
+                    or not snapshot.is_current(signature)):
+                self.build()
+
+    def build(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.executescript(_SCHEMA)
+            for corpus in CORPORA:
+                for kind, name, body, level, school, source, creature_type, cr in corpus():
+                    cur = conn.execute(
+                        "INSERT INTO meta (kind, name, level, school, source, creature_type, cr) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (kind, name, level, school, source, creature_type, cr))
+                    conn.execute("INSERT INTO entries (rowid, name, body) VALUES (?, ?, ?)",
+                                 (cur.lastrowid, name, body or ""))
+            conn.executemany("INSERT INTO info VALUES (?, ?)", [
+                ("version", INDEX_VERSION),
+                ("sources", json.dumps(snapshot.files_signature(self._sources()))),
+            ])
+            conn.execute("INSERT INTO entries(entries) VALUES ('optimize')")
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, self.path)
+        # connections opened on the old file have to be reopened
+        self._local = threading.local()
+
+    def search(self, text, kind=None, level=None, school=None, source=None,
+               creature_type=None, min_cr=None, max_cr=None, limit=10, raw=False):
+        """
+        Ranked search over names and rules text (names weigh 10x the body).
+        text is free text unless raw=True, in which case it is passed as an FTS5 query.
+        """
+        sql = ["SELECT m.kind, m.name, bm25(entries, 10.0, 1.0) AS score, m.level, m.school,"
+               " m.source, m.creature_type, m.cr"
+               " FROM entries JOIN meta m ON m.id = entries.rowid WHERE entries MATCH ?"]
+        params = [text if raw else _query_string(text)]
+        if params[0] == "":
+            return []
+        for column, value in (("kind", kind), ("level", level), ("school", school), ("creature_type", creature_type)):
+            if value is not None:
+                sql.append(f"AND m.{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if source is not None:
+            sql.append("AND m.source LIKE ?")
+            params.append(f"%{source}%")
+        if min_cr is not None:
+            sql.append("AND m.cr >= ?")
+            params.append(parse_cr(min_cr))
+        if max_cr is not None:
+            sql.append("AND m.cr <= ?")
+            params.append(parse_cr(max_cr))
+        sql.append("ORDER BY score LIMIT ?")
+        params.append(limit)
+
+        rows = self._connection().execute(" ".join(sql), params).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def search_index() -> RulesSearchIndex:
+    """The shared search index, opened (and built if needed) on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RulesSearchIndex()
+    return _index
+
+
+def search(text, **filters):
+    return search_index().search(text, **filters)
@@ -0,0 +1,248 @@
+# Monte Carlo encounter simulator: plays the same fight many times to balance encounters.
+# Battles are split across a process pool and every worker rolls from its own
+# child RNG stream, so a given (seed, workers) pair always gives the same report.
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+import rng
+import probability
+from actions import Action, ActionType
+from game_engine import CombatTracker, DamageType, DiceHandler
+
+PARTY = 0
+ENEMIES = 1
+
+def unarmed_strike(creature):
+    """Fallback attack for creatures without one of their own: 1 + STR bludgeoning, never below 0."""
+    str_mod = creature.ability_scores.modifier("STR")
+    proficiencies = getattr(creature, "proficiencies", None)
+    prof = proficiencies.proficiency_bonus if proficiencies else 2
+    return Action(
+        id="unarmed_strike",
+        name="Unarmed Strike",
+        action_type=ActionType.ACTION,
+        attack_roll={"ability": None,
+                     "bonus": str_mod + prof,
+                     "proficiency_type": None,
+                     "precomputed": True},
+        damage_roll=[{"dmg_type": DamageType.BLUDGEONING,
+                      "dice_type": 1,
+                      "dice_amount": 1,
+                      "ability": None,
+                      "bonus": max(str_mod, -1),
+                      "precomputed": True}])
+
+
+@dataclass
+class CombatantStats:
+    name: str
+    side: int
+    damage_dealt: int = 0
+    damage_taken: int = 0
+    attacks: int = 0
+    hits: int = 0
+    crits: int = 0
+    times_downed: int = 0
+    actions_used: Counter = field(default_factory=Counter)
+
+    def merge(self, other):
+        self.damage_dealt += other.damage_dealt
+        self.damage_taken += other.damage_taken
+        self.attacks += other.attacks
+        self.hits += other.hits
+        self.crits += other.crits
+        self.times_downed += other.times_downed
+        self.actions_used.update(other.actions_used)
+
+
+@dataclass
+class EncounterReport:
+    battles: int = 0
+    party_wins: int = 0
+    enemy_wins: int = 0
+    draws: int = 0
+    rounds: Counter = field(default_factory=Counter)         # rounds per battle -> count
+    rounds_to_win: Counter = field(default_factory=Counter)  # same, party wins only
+    combatants: List[CombatantStats] = field(default_factory=list)
+
+    @property
+    def win_rate(self) -> float:
+        return self.party_wins / self.battles if self.battles else 0.0
+
+    def mean_rounds(self) -> float:
+        total = sum(self.rounds.values())
+        return sum(r * c for r, c in self.rounds.items()) / total if total else 0.0
+
+    def per_battle(self) -> Dict[str, Dict[str, float]]:
+        """Average damage dealt/taken, attacks and downs per battle for each combatant."""
+        return {
+            c.name: {
+                "damage_dealt": c.damage_dealt / self.battles,
+                "damage_taken": c.damage_taken / self.battles,
+                "attacks": c.attacks / self.battles,
+                "hit_rate": c.hits / c.attacks if c.attacks else 0.0,
+                "downed_rate": c.times_downed / self.battles,
+            }
+            for c in self.combatants
+        }
+
+    def merge(self, other):
+        self.battles += other.battles
+        self.party_wins += other.party_wins
+        self.enemy_wins += other.enemy_wins
+        self.draws += other.draws
+        self.rounds.update(other.rounds)
+        self.rounds_to_win.update(other.rounds_to_win)
+        if not self.combatants:
+            self.combatants = other.combatants
+        else:
+            for mine, theirs in zip(self.combatants, other.combatants):
+                mine.merge(theirs)
+
+
+def _max_hp(creature):
+    # PCs track hp in their ResourcePool, NPCs only have the stat block value
+    hp = creature.resources.max_hit_points or getattr(creature, "hp", 0)
+    return hp if isinstance(hp, int) else 1
+
+
+def _labels(creatures):
+    names = [c.name if hasattr(c, "name") else c.identity.name for c in creatures]
+    totals = Counter(names)
+    seen = Counter()
+    labels = []
+    for name in names:
+        seen[name] += 1
+        labels.append(f"{name} #{seen[name]}" if totals[name] > 1 else name)
+    return labels
+
+
+def _attack_options(creature):
+    return [
+        a for a in creature.actions.available()
+        if a.action_type == ActionType.ACTION and a.attack_roll and a.damage_roll
+    ]
+
+
+class _Encounter:
+    """Runs battles for one worker. Creatures are shared read-only, hp is tracked here."""
+
+    def __init__(self, party, enemies, max_rounds):
+        self.creatures = list(party) + list(enemies)
+        self.sides = [PARTY] * len(party) + [ENEMIES] * len(enemies)
+        self.max_hp = [_max_hp(c) for c in self.creatures]
+        self.index_of = {id(c): i for i, c in enumerate(self.creatures)}
+        self.options = [_attack_options(c) for c in self.creatures]
+        # creatures with no attack action punch instead, resolved outside their ActionManager
+        self.unarmed = [None if opts else unarmed_strike(c) for c, opts in zip(self.creatures, self.options)]
+        self.max_rounds = max_rounds
+        self._best_action = {}
+
+    def best_action(self, i, target_ac):
+        key = (i, target_ac)
+        if key not in self._best_action:
+            creature = self.creatures[i]
+            self._best_action[key] = max(
+                self.options[i] or [self.unarmed[i]],
+                key=lambda a: probability.attack_odds(a, target_ac, source=creature).expected_damage)
+        return self._best_action[key]
+
+    def run(self, battles) -> EncounterReport:
+        report = EncounterReport(combatants=[
+            CombatantStats(name=label, side=side)
+            for label, side in zip(_labels(self.creatures), self.sides)])
+        for _ in range(battles):
+            self.fight(report)
+        return report
+
+    def fight(self, report):
+        creatures, sides, stats = self.creatures, self.sides, report.combatants
+        hp = list(self.max_hp)
+        alive = [len(self.sides) - sum(sides), sum(sides)]  # living creatures per side
+        dice = DiceHandler()
+
+        tracker = CombatTracker(creatures)
+        tracker.start_combat()
+
+        while tracker.round_number <= self.max_rounds and alive[PARTY] and alive[ENEMIES]:
+            attacker = tracker.get_current_combatant()
+            i = self.index_of[id(attacker)]
+
+            # focus fire on the weakest living opponent
+            j = min((j for j in range(len(creatures)) if sides[j] != sides[i] and hp[j] > 0),
+                    key=hp.__getitem__)
+            target = creatures[j]
+            action = self.best_action(i, target.stats.armor_class())
+
+            if action is self.unarmed[i]:
+                result = dice.roll_attack(action, attacker, target)
+            else:
+                result = attacker.actions.attack_roll(action.id, attacker, target)
+
+            stats[i].attacks += 1
+            stats[i].actions_used[action.id] += 1
+            if result.hit:
+                # a negative total (big penalties) deals nothing rather than healing the target
+                damage = min(max(result.damage.total, 0), hp[j])
+                hp[j] -= damage
+                stats[i].hits += 1
+                stats[i].crits += result.is_critical
+                stats[i].damage_dealt += damage
+                stats[j].damage_taken += damage
+                if hp[j] <= 0:
+                    stats[j].times_downed += 1
+                    alive[sides[j]] -= 1
+                    tracker.remove_combatant(target)
+                    if not alive[sides[j]]:
+                        break
+
+            tracker.next_turn()
+
+        report.battles += 1
+        report.rounds[tracker.round_number] += 1
+        if not alive[ENEMIES]:
+            report.party_wins += 1
+            report.rounds_to_win[tracker.round_number] += 1
+        elif not alive[PARTY]:
+            report.enemy_wins += 1
+        else:
+            report.draws += 1
+
+
+def _run_batch(party, enemies, battles, seed_sequence, max_rounds):
+    with rng.use_stream(rng.RNGStream(seed_sequence)):
+        return _Encounter(party, enemies, max_rounds).run(battles)
+
+
+def simulate_encounter(party, enemies, battles=10_000, workers=None, seed=None, max_rounds=100) -> EncounterReport:
+    """
+    Play `battles` full combats of party (character.PC objects) against enemies
+    (npcs.NPC objects) using CombatTracker turn order and ActionManager.attack_roll.
+    Every creature attacks the weakest living opponent with its best attack each turn.
+    Only attack actions are used, so no resources (spell slots, recharge, legendary actions)
+    are spent and the report counts actions_used instead.
+    workers=1 runs in-process, otherwise battles are split across a process pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, battles))
+    streams = rng.RNGStream(seed).spawn(workers)
+    chunks = [len(c) for c in np.array_split(np.arange(battles), workers)]
+
+    report = EncounterReport()
+    if workers == 1:
+        report.merge(_run_batch(party, enemies, battles, streams[0].seed_sequence, max_rounds))
+        return report
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_batch, party, enemies, n, stream.seed_sequence, max_rounds)
+            for n, stream in zip(chunks, streams)
+        ]
+        for future in futures:
+            report.merge(future.result())
+    return report
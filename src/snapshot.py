@@ -0,0 +1,130 @@
+# Precompiled rules snapshot: every repository pickled after parsing/normalizing,
+# so new web or simulation workers can skip the JSON/CSV parsing on start.
+# Each dataset records the size, mtime and hash of its source files and is
+# rebuilt automatically once one of them changes.
+#
+# Build ahead of time with:  python snapshot.py
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+import repositories
+
+SNAPSHOT_VERSION = 5
+SNAPSHOT_PATH = repositories.data_path("rules.snapshot")
+
+_snapshot = None  # in-memory copy of the snapshot file
+_lock = threading.RLock()
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def files_signature(filenames):
+    """[(filename, size, mtime_ns, sha1), ...] for files in the data directory."""
+    signature = []
+    for filename in filenames:
+        path = repositories.data_path(filename)
+        stat = os.stat(path)
+        signature.append((filename, stat.st_size, stat.st_mtime_ns, _file_hash(path)))
+    return signature
+
+
+def source_signature(name):
+    """files_signature of the source files of a dataset."""
+    return files_signature(repositories.SOURCES[name])
+
+
+def is_current(signature):
+    """True if none of the files in a files_signature have changed since."""
+    for filename, size, mtime_ns, sha1 in signature:
+        path = repositories.data_path(filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        # cheap check first, only hash when the file looks touched
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns) and _file_hash(path) != sha1:
+            return False
+    return True
+
+
+def _empty():
+    return {"version": SNAPSHOT_VERSION, "python": sys.version_info[:2], "datasets": {}}
+
+
+def _read(path=SNAPSHOT_PATH):
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = _empty()
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+                if data.get("version") == SNAPSHOT_VERSION and data.get("python") == sys.version_info[:2]:
+                    _snapshot = data
+            except (FileNotFoundError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+                pass
+        return _snapshot
+
+
+def _write(snapshot, path=SNAPSHOT_PATH):
+    # write to a temp file and swap it in, so concurrent readers never see half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_repository(name, path=SNAPSHOT_PATH):
+    """The pickled repository for `name`, or None if it is missing or out of date."""
+    entry = _read(path)["datasets"].get(name)
+    if entry is None or not is_current(entry["sources"]):
+        return None
+    return entry["repository"]
+
+
+def store_repository(name, repository, path=SNAPSHOT_PATH):
+    """Add/replace one dataset in the snapshot file."""
+    with _lock:
+        snapshot = _read(path)
+        snapshot["datasets"][name] = {"sources": source_signature(name), "repository": repository}
+        try:
+            _write(snapshot, path)
+        except OSError:
+            pass  # read-only data dir, keep the in-memory copy
+
+
+def build(path=SNAPSHOT_PATH):
+    """Parse every dataset whose source files exist and write a fresh snapshot."""
+    global _snapshot
+    with _lock:
+        snapshot = _empty()
+        for name, loader in repositories.LOADERS.items():
+            if not all(os.path.exists(repositories.data_path(f)) for f in repositories.SOURCES[name]):
+                continue
+            snapshot["datasets"][name] = {"sources": source_signature(name), "repository": loader()}
+        _write(snapshot, path)
+        _snapshot = snapshot
+        return sorted(snapshot["datasets"])
+
+
+def clear():
+    """Forget the in-memory snapshot so the next lookup re-reads the file."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    built = build()
+    print(f"Built {SNAPSHOT_PATH} with {built} in {time.perf_counter() - start:.2f}s")
@@ -1,6 +1,24 @@
-import json
+import csv
+import os
+import re
 from collections import defaultdict
-from helper_functions import normalize_fg, clean_item_description, extract_link_text
+from helper_functions import load_fg, clean_item_description, extract_link_text
+from game_engine import DamageType
+import derived_stats
+from stat_inputs import ABILITY_ABBREVIATIONS
+
+_DICE = re.compile(r"(\d+)d(\d+)(?:\s*\+\s*your spellcasting ability modifier)?\s+(\w+)\s+damage", re.I)
+_SAVE = re.compile(r"(Strength|Dexterity|Constitution|Intelligence|Wisdom|Charisma) saving throw", re.I)
+_AREA = re.compile(r"(\d+)-foot[- ](?:radius|wide|long|tall|high)?[- ]?(sphere|cube|cone|line|cylinder|square|radius|emanation)", re.I)
+_LINE = re.compile(r"line (\d+) feet long", re.I)
+# woc descriptions start with a header: "8th-Level Necromancy Casting Time : ... Duration : Instantaneous <text>"
+_CSV_DURATION = re.compile(r"Duration\s*:\s*(Concentration, up to \d+ \w+|Instantaneous|Until dispelled(?: or triggered)?"
+                           r"|Special|\d+ \w+)\s*", re.I)
+
+
+def spell_key(name):
+    """Lookup key for a spell name, case and " (Copy)" insensitive."""
+    return name.replace(" (Copy)", "").strip().lower()
 
 
 class Spell:
@@ -11,22 +29,88 @@ class Spell:
         self.duration = data["duration"]
         self.school = data["school"]
         self.components = data["components"]
-        #self.dmg_type = data["DamageType"]
         self.cast_time = data["castingtime"]
         self.range = data["range"]
         self.ritual =  data.get("ritual", None) 
         self.source = data.get("source", None) 
         self.links = extract_link_text(data)
-        #self.save = data["Save"]
+        self.extract(data.get("DamageType"), data.get("Save"))
+
+    @classmethod
+    def from_csv(cls, row):
+        """A Spell from a woc_spells.csv row."""
+        description = row["description"]
+        duration = _CSV_DURATION.search(description)
+        if duration:
+            description = description[duration.end():]
+        return cls({
+            "name": row["name"],
+            "level": row["Level"] or 0,
+            "duration": duration.group(1) if duration else None,
+            "school": row["School"] or None,
+            "components": row["Components"] or None,
+            "castingtime": row["CastingTime"] or None,
+            "range": row["Range"] or None,
+            "description": {"p": description},
+            "DamageType": row["DamageType"],
+            "Save": row["Save"],
+        })
+
+    def extract(self, damage_type=None, save=None):
+        """Pre-extract damage dice, damage types, save ability and area from the text."""
+        self.damage_dice = []       # [(count, sides, DamageType)]
+        for count, sides, dmg_type in _DICE.findall(self.description):
+            dmg_type = DamageType.__members__.get(dmg_type.upper())
+            if dmg_type is not None:
+                self.damage_dice.append((int(count), int(sides), dmg_type))
+        self.damage_types = list(dict.fromkeys(d for _, _, d in self.damage_dice))
+        if not self.damage_types and damage_type:
+            # "Radiant or necrotic", "Acid, cold, fire, or lightning"
+            self.damage_types = [DamageType[w.upper()] for w in re.findall(r"\w+", damage_type)
+                                 if w.upper() in DamageType.__members__]
+
+        save = save or (_SAVE.search(self.description) or [None, None])[1]
+        self.save = ABILITY_ABBREVIATIONS.get(save.lower()) if save else None
+
+        area = _AREA.search(self.description)
+        line = None if area else _LINE.search(self.description)
+        if area:
+            self.area = (int(area.group(1)), area.group(2).lower())   # (30, "cube")
+        else:
+            self.area = (int(line.group(1)), "line") if line else None
+
+    def merge(self, other):
+        """Fill what this spell is missing from another source of the same spell."""
+        for attr in ("duration", "school", "components", "cast_time", "range", "save", "area"):
+            if getattr(self, attr) in (None, "") and getattr(other, attr) not in (None, ""):
+                setattr(self, attr, getattr(other, attr))
+        if not self.damage_dice:
+            self.damage_dice = other.damage_dice
+        if not self.damage_types:
+            self.damage_types = other.damage_types
+        if not self.description:
+            self.description = other.description
+
 
 class Spellcasting:
+    __slots__ = ("owner", "known_spells", "prepared_spells", "_spellcasting_ability", "spell_save_dc")
+
     def __init__(self, owner):
         self.owner = owner
         self.known_spells = dict()
         self.prepared_spells = dict()
-        self.spellcasting_ability = None
+        self._spellcasting_ability = None
         self.spell_save_dc = None
 
+    @property
+    def spellcasting_ability(self):
+        return self._spellcasting_ability
+
+    @spellcasting_ability.setter
+    def spellcasting_ability(self, ability):
+        self._spellcasting_ability = ability
+        derived_stats.invalidate(self.owner, derived_stats.SPELLCASTING)
+
     def manage_spells(self, spell: Spell,action="add"):
         if action=="add":
             self.known_spells[spell.name] = spell
@@ -47,15 +131,25 @@ class Spellcasting:
 
 
 class SpellRepository:
-    def __init__(self, path="../data/spell.json"):
-        with open(path, "r", encoding="utf-8") as f:
-            raw_data = normalize_fg(json.load(f))
-
-        # Create objects
-        self.all_spells = [Spell(item) for item in raw_data]
+    def __init__(self, path="../data/spell.json", csv_path="../data/woc_spells.csv"):
+        # Create objects, spell.json first, woc_spells.csv adds the spells it lacks and fills gaps
+        by_key = {}
+        for spell in (Spell(item) for item in load_fg(path, "spell")):
+            by_key.setdefault(spell_key(spell.name), spell)
+        if csv_path and os.path.exists(csv_path):
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    spell = Spell.from_csv(row)
+                    key = spell_key(spell.name)
+                    if key in by_key:
+                        by_key[key].merge(spell)
+                    else:
+                        by_key[key] = spell
+        self.all_spells = list(by_key.values())
 
         # Primary index (fast lookup by name)
         self.by_name = {item.name: item for item in self.all_spells}
+        self.by_key = by_key
 
         # Secondary indexes (fast filtering)
         self.by_level = defaultdict(list)
@@ -73,10 +167,13 @@ class SpellRepository:
             # ---- Retrieval Methods ----
 
     def get(self, name):
-        return self.by_name.get(name)
+        spell = self.by_name.get(name)
+        if spell is None:
+            spell = self.by_key.get(spell_key(name))
+        return spell
 
     def get_many(self, names):
-        return [self.by_name[n] for n in names if n in self.by_name]
+        return [spell for spell in map(self.get, names) if spell is not None]
 
     def filter_by_level(self, spell_level):
         return self.by_level.get(spell_level, [])
@@ -0,0 +1,39 @@
+# Inputs of the derived character values and the invalidate() call the managers that own
+# them make on a change. Kept free of engine imports so every manager (proficiency included,
+# which derived_stats itself imports) can import it at the top level. See derived_stats.
+ABILITIES = ("STR", "DEX", "CON", "INT", "WIS", "CHA")
+
+# full ability name, as written in stat blocks and spell text -> abbreviation
+ABILITY_ABBREVIATIONS = {"strength": "STR", "dexterity": "DEX", "constitution": "CON",
+                         "intelligence": "INT", "wisdom": "WIS", "charisma": "CHA"}
+
+
+def ability_input(name):
+    return ("ability", name)
+
+
+def proficiency_input(prof_type):
+    return ("proficiency", prof_type)
+
+
+ALL_ABILITIES = tuple(ability_input(a) for a in ABILITIES)
+PROFICIENCY_BONUS = "proficiency_bonus"
+FEATURES = "features"
+EQUIPMENT = "equipment"
+CLASSES = "classes"
+SPELLCASTING = "spellcasting"
+CONDITIONS = "conditions"
+
+# every ability, not just DEX: modify_ac features read others (Unarmored Defense adds CON or WIS)
+ARMOR_CLASS_INPUTS = frozenset({*ALL_ABILITIES, EQUIPMENT, FEATURES, CONDITIONS})
+
+
+def invalidate(owner, *inputs):
+    """Tell owner's derived values and cached AC that inputs changed."""
+    derived = getattr(owner, "derived", None)
+    if derived is not None:
+        derived.invalidate(*inputs)
+    if not ARMOR_CLASS_INPUTS.isdisjoint(inputs):
+        stats = getattr(owner, "stats", None)
+        if stats is not None:
+            stats.invalidate_armor_class()
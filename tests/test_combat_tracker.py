@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from game_engine import CombatTracker
+
+
+class Combatant:
+    def __init__(self, name, initiative):
+        self.name = name
+        self.initiative = initiative
+
+    def roll_initiative(self):
+        return self.initiative
+
+
+def make_tracker():
+    a, b, c, d = (Combatant(name, init) for name, init in zip("abcd", (20, 15, 10, 5)))
+    tracker = CombatTracker([a, b, c, d])
+    tracker.start_combat()
+    return tracker, (a, b, c, d)
+
+
+def test_removing_current_combatant_passes_turn_to_the_next():
+    tracker, (a, b, c, d) = make_tracker()
+    tracker.next_turn()
+    assert tracker.get_current_combatant() is b
+
+    tracker.remove_combatant(b)
+    tracker.next_turn()
+    assert tracker.get_current_combatant() is c
+    assert tracker.round_number == 1
+
+
+def test_removing_current_last_combatant_starts_next_round():
+    tracker, (a, b, c, d) = make_tracker()
+    for _ in range(3):
+        tracker.next_turn()
+    assert tracker.get_current_combatant() is d
+
+    tracker.remove_combatant(d)
+    tracker.next_turn()
+    assert tracker.get_current_combatant() is a
+    assert tracker.round_number == 2
+
+
+def test_removing_earlier_combatant_keeps_current_turn():
+    tracker, (a, b, c, d) = make_tracker()
+    tracker.next_turn()
+    tracker.next_turn()
+    assert tracker.get_current_combatant() is c
+
+    tracker.remove_combatant(a)
+    assert tracker.get_current_combatant() is c
+    tracker.next_turn()
+    assert tracker.get_current_combatant() is d